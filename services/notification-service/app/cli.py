@@ -0,0 +1,80 @@
+"""Maintenance commands for the notification service.
+
+Usage:
+    python -m app.cli backfill-status-indexes
+    python -m app.cli reconcile-unread-counts
+    python -m app.cli migrate-storage-format [--format compact|hash]
+    python -m app.cli memory-report [--sample 1000]
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.database import redis_manager
+from app.services.notification_service import notification_service
+
+
+async def backfill_status_indexes(args: argparse.Namespace) -> None:
+    """Build per-status indexes for notifications created before they existed"""
+    users = await notification_service.rebuild_status_indexes()
+    logger.info(f"Status index backfill complete for {users} users")
+
+
+async def reconcile_unread_counts(args: argparse.Namespace) -> None:
+    """Rebuild unread counters from the sorted-set indexes"""
+    users = await notification_service.reconcile_unread_counts()
+    logger.info(f"Unread counter reconciliation complete for {users} users")
+
+
+async def migrate_storage_format(args: argparse.Namespace) -> None:
+    """Convert existing notification records to the target storage format"""
+    result = await notification_service.migrate_storage_format(args.format)
+    logger.info(f"Storage format migration complete: {result['converted']} of {result['scanned']} records converted")
+
+
+async def memory_report(args: argparse.Namespace) -> None:
+    """Print a memory comparison of the hash and compact storage formats"""
+    report = await notification_service.storage_memory_report(args.sample)
+    print(json.dumps(report, indent=2))
+
+
+COMMANDS = {
+    "backfill-status-indexes": backfill_status_indexes,
+    "reconcile-unread-counts": reconcile_unread_counts,
+    "migrate-storage-format": migrate_storage_format,
+    "memory-report": memory_report,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Notification service maintenance commands")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument(
+        "--format",
+        choices=["hash", "compact"],
+        default=settings.NOTIFICATION_STORAGE_FORMAT,
+        help="Target storage format for migrate-storage-format"
+    )
+    parser.add_argument("--sample", type=int, default=1000, help="Records to sample for memory-report")
+    args = parser.parse_args()
+
+    async def run():
+        await redis_manager.connect()
+        try:
+            await COMMANDS[args.command](args)
+        finally:
+            await redis_manager.disconnect()
+
+    try:
+        asyncio.run(run())
+    except Exception as e:
+        logger.error(f"Command {args.command} failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,56 +1,133 @@
-import redis
+import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
 from loguru import logger
 from app.core.config import settings
+from app.core.metrics import redis_metrics
+from time import perf_counter
 from typing import Optional
 import asyncio
 from functools import wraps
 
 
 def async_redis_operation(func):
-    """Decorator to run synchronous Redis operations in async context"""
+    """Decorator to run Redis operations in async context.
+
+    Kept as a compatibility shim: coroutine functions are awaited directly on
+    the event loop, while legacy synchronous callables still run in the
+    default executor.
+    """
+    if asyncio.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            return await func(*args, **kwargs)
+        return async_wrapper
+
     @wraps(func)
     async def wrapper(*args, **kwargs):
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, func, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: func(*args, **kwargs))
     return wrapper
 
 
+class InstrumentedPipeline(Pipeline):
+    """Pipeline recording one latency sample per round trip.
+
+    Commands issued while keys are WATCHed run immediately and are recorded
+    by name; a buffered pipeline is recorded as MULTI or PIPELINE.
+    """
+
+    async def immediate_execute_command(self, *args, **options):
+        duration, errors = redis_metrics(args[0])
+        started = perf_counter()
+        try:
+            return await super().immediate_execute_command(*args, **options)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            duration.observe(perf_counter() - started)
+
+    async def execute(self, raise_on_error: bool = True):
+        duration, errors = redis_metrics("MULTI" if self.is_transaction else "PIPELINE")
+        started = perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            duration.observe(perf_counter() - started)
+
+
+class InstrumentedRedis(redis.Redis):
+    """Redis client recording latency and errors per command"""
+
+    async def execute_command(self, *args, **options):
+        duration, errors = redis_metrics(args[0])
+        started = perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            duration.observe(perf_counter() - started)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
 class RedisManager:
     def __init__(self):
-        self.redis_client: Optional[redis.Redis] = None
+        self.pool: Optional[redis.ConnectionPool] = None
+        self.redis_client: Optional[InstrumentedRedis] = None
 
     async def connect(self):
         """Connect to Redis database"""
         try:
-            self.redis_client = redis.from_url(
+            self.pool = redis.ConnectionPool.from_url(
                 settings.REDIS_URL,
                 decode_responses=True,
-                health_check_interval=30
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL
             )
+            self.redis_client = InstrumentedRedis(connection_pool=self.pool)
             # Test connection
             await self._ping()
-            logger.info("Connected to Redis successfully")
+            logger.info(
+                f"Connected to Redis successfully (pool size {settings.REDIS_MAX_CONNECTIONS})"
+            )
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {e}")
-            self.redis_client = None
+            await self._close_pool()
 
     async def disconnect(self):
         """Disconnect from Redis database"""
         if self.redis_client:
-            await asyncio.get_event_loop().run_in_executor(None, self.redis_client.close)
+            await self._close_pool()
             logger.info("Disconnected from Redis")
 
+    async def _close_pool(self):
+        """Close the client and release all pooled connections"""
+        if self.redis_client:
+            await self.redis_client.aclose()
+        if self.pool:
+            await self.pool.disconnect()
+        self.redis_client = None
+        self.pool = None
+
     async def get_client(self) -> Optional[redis.Redis]:
         """Get Redis client instance"""
         if not self.redis_client:
             await self.connect()
         return self.redis_client
 
-    @async_redis_operation
-    def _ping(self):
-        """Ping Redis synchronously"""
+    async def _ping(self):
+        """Ping Redis"""
         if self.redis_client:
-            return self.redis_client.ping()
+            return await self.redis_client.ping()
         return False
 
     async def health_check(self) -> bool:
@@ -65,4 +142,4 @@ class RedisManager:
 
 
 # Global Redis manager instance
-redis_manager = RedisManager() 
\ No newline at end of file
+redis_manager = RedisManager()
@@ -0,0 +1,162 @@
+"""Prometheus metrics for the notification service.
+
+Metrics live in the default registry, so process metrics (CPU, memory, open
+file descriptors) are exported alongside them. Hot-path helpers cache their
+labelled children: recording a sample is a dict lookup plus a lock-protected
+add, which is small next to the Redis round trip or request it measures.
+Gauges and counters describing service state (backlogs, pools, worker
+totals) are collected when ``/metrics`` is scraped, by
+``app.services.metrics_service``.
+"""
+from time import perf_counter
+from typing import Dict, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+
+
+# Fast operations: Redis commands and event handlers
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# Requests and batch writes
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# HTTP
+HTTP_REQUEST_DURATION = Histogram(
+    "notification_http_request_duration_seconds",
+    "Time until the response starts, by route template",
+    ["method", "route", "status"],
+    buckets=REQUEST_BUCKETS
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "notification_http_requests_in_progress",
+    "Requests being handled, including open streams"
+)
+
+# Redis
+REDIS_COMMAND_DURATION = Histogram(
+    "notification_redis_command_duration_seconds",
+    "Redis round trip by command; pipelines count as one PIPELINE or MULTI",
+    ["command"],
+    buckets=FAST_BUCKETS
+)
+REDIS_COMMAND_ERRORS = Counter(
+    "notification_redis_command_errors_total",
+    "Redis commands that raised, by command",
+    ["command"]
+)
+
+# Event consumers
+EVENT_HANDLING_DURATION = Histogram(
+    "notification_event_handling_duration_seconds",
+    "Time to decode an event and build its notification",
+    ["queue", "event_type"],
+    buckets=FAST_BUCKETS
+)
+EVENTS_HANDLED = Counter(
+    "notification_events_handled_total",
+    "Events handled by queue, event type and outcome (notification, ignored, error)",
+    ["queue", "event_type", "outcome"]
+)
+EVENT_BATCH_DURATION = Histogram(
+    "notification_event_batch_duration_seconds",
+    "Time to persist and ack a batch of events",
+    ["queue"],
+    buckets=REQUEST_BUCKETS
+)
+EVENT_BATCHES = Counter(
+    "notification_event_batches_total",
+    "Persisted event batches by outcome (ok, error)",
+    ["queue", "outcome"]
+)
+EVENT_BATCH_EVENTS = Counter(
+    "notification_event_batch_events_total",
+    "Events in persisted batches by outcome (ok, error)",
+    ["queue", "outcome"]
+)
+
+# Rate limiting
+RATE_LIMIT_DECISIONS = Counter(
+    "notification_rate_limit_decisions_total",
+    "Rate limiter decisions by budget (allowed, limited, error = Redis unavailable, let through)",
+    ["budget", "decision"]
+)
+
+# Notifications
+NOTIFICATIONS_CREATED = Counter(
+    "notification_created_total",
+    "Notifications created by type",
+    ["type"]
+)
+
+
+_redis_children: Dict[str, Tuple[object, object]] = {}
+_event_children: Dict[Tuple[str, str, str], Tuple[object, object]] = {}
+
+
+def redis_metrics(command: str):
+    """Duration and error children for a Redis command, created on first use"""
+    children = _redis_children.get(command)
+    if children is None:
+        children = _redis_children[command] = (
+            REDIS_COMMAND_DURATION.labels(command),
+            REDIS_COMMAND_ERRORS.labels(command)
+        )
+    return children
+
+
+def event_metrics(queue: str, event_type: str, outcome: str):
+    """Duration and count children for a handled event, created on first use"""
+    key = (queue, event_type, outcome)
+    children = _event_children.get(key)
+    if children is None:
+        children = _event_children[key] = (
+            EVENT_HANDLING_DURATION.labels(queue, event_type),
+            EVENTS_HANDLED.labels(queue, event_type, outcome)
+        )
+    return children
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording request latency per route template.
+
+    Latency is measured until the response starts, so long-lived streams are
+    counted like any other request. Requests that match no route share the
+    ``unmatched`` label to keep cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = perf_counter()
+        status = 500
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            recorded = True
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                str(status)
+            ).observe(perf_counter() - started)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                record()
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            if not recorded:
+                record()
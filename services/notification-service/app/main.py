@@ -1,17 +1,25 @@
 import asyncio
 import sys
+from datetime import datetime
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 import uvicorn
 from loguru import logger
 
 from app.core.config import settings
 from app.core.database import redis_manager
+from app.core.metrics import RequestMetricsMiddleware
 from app.routers.notifications import router as notifications_router
 from app.services.event_service import event_service
+from app.services.cleanup_service import cleanup_service
+from app.services.scheduler_service import scheduler_service
+from app.services.email_service import email_service
+from app.services.stream_service import stream_service
+from app.services.metrics_service import metrics_service
+from app.services.template_service import template_service
 
 
 # Configure logging
@@ -41,15 +49,24 @@ async def lifespan(app: FastAPI):
     # Connect to Redis
     await redis_manager.connect()
     
-    # Connect to RabbitMQ (but don't start consuming yet)
+    # Compile notification templates up front rather than on the first event
+    template_service.preload()
+    
+    # Start the background cleanup worker, scheduled delivery, email delivery
+    # and real-time stream fan-out
+    await cleanup_service.start()
+    await scheduler_service.start()
+    await email_service.start()
+    await stream_service.start()
+    
+    # Connect to RabbitMQ and consume on the application event loop
     await event_service.connect()
+    await event_service.start_consuming()
     
-    # Start event consumer in background thread
     if event_service.is_connected:
-        await event_service.start_consuming()
         logger.info("Started event consumer")
     else:
-        logger.warning("RabbitMQ not connected - events will not be processed")
+        logger.warning("RabbitMQ not connected - events will be processed once it is reachable")
     
     logger.info("Notification Service started successfully")
     
@@ -59,7 +76,11 @@ async def lifespan(app: FastAPI):
     logger.info("Shutting down Notification Service...")
     
     # Disconnect from services
-    event_service.disconnect()
+    await cleanup_service.stop()
+    await scheduler_service.stop()
+    await email_service.stop()
+    await stream_service.stop()
+    await event_service.disconnect()
     await redis_manager.disconnect()
     
     logger.info("Notification Service shutdown complete")
@@ -72,6 +93,7 @@ app = FastAPI(
     description="Notification Service for Library Management System",
     docs_url="/docs" if settings.DEBUG else None,
     redoc_url="/redoc" if settings.DEBUG else None,
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -84,6 +106,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record request latency per route
+app.add_middleware(RequestMetricsMiddleware)
+
 # Add trusted host middleware for production
 if settings.ENVIRONMENT == "production":
     app.add_middleware(
@@ -126,7 +151,7 @@ async def health_check():
                 "success": True,
                 "message": f"Notification Service is {status}",
                 "data": {
-                    "timestamp": "2024-01-15T10:30:00.000Z",
+                    "timestamp": datetime.utcnow().isoformat(),
                     "status": status,
                     "services": {
                         "redis": "connected" if redis_healthy else "disconnected",
@@ -148,6 +173,13 @@ async def health_check():
         )
 
 
+# Prometheus metrics endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for scraping"""
+    return Response(content=await metrics_service.render(), headers={"Content-Type": metrics_service.content_type})
+
+
 # Include routers
 app.include_router(
     notifications_router,
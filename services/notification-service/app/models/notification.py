@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, model_validator
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 from enum import Enum
@@ -16,6 +16,7 @@ class NotificationStatus(str, Enum):
     SENT = "sent"
     FAILED = "failed"
     READ = "read"
+    SCHEDULED = "scheduled"
 
 
 class NotificationPriority(str, Enum):
@@ -51,6 +52,8 @@ class NotificationResponse(BaseModel):
     sent_at: Optional[datetime] = None
     read_at: Optional[datetime] = None
     scheduled_at: Optional[datetime] = None
+    attempts: int = 0
+    last_error: Optional[str] = None
 
 
 class NotificationUpdate(BaseModel):
@@ -61,19 +64,72 @@ class NotificationUpdate(BaseModel):
 class NotificationSendRequest(BaseModel):
     type: NotificationType
     recipient: str = Field(..., description="User ID, email, or phone number")
+    recipient_email: Optional[EmailStr] = Field(None, description="Address email notifications are sent to")
     title: str = Field(..., max_length=255)
     message: str = Field(..., max_length=2000)
     priority: NotificationPriority = NotificationPriority.MEDIUM
     data: Optional[Dict[str, Any]] = None
+    scheduled_at: Optional[datetime] = Field(None, description="Deliver at this time instead of immediately")
+
+    @model_validator(mode="before")
+    @classmethod
+    def default_recipient_email(cls, values: Any) -> Any:
+        # An email-shaped recipient doubles as the address of an email notification
+        if (
+            isinstance(values, dict)
+            and values.get("type") == NotificationType.EMAIL
+            and not values.get("recipient_email")
+            and "@" in str(values.get("recipient", ""))
+        ):
+            values = {**values, "recipient_email": values["recipient"]}
+        return values
+
+    @model_validator(mode="after")
+    def require_email_address(self) -> "NotificationSendRequest":
+        if self.type == NotificationType.EMAIL and self.recipient_email is None:
+            raise ValueError("recipient_email is required for email notifications")
+        return self
+
+
+class NotificationBatchSendRequest(BaseModel):
+    # Items are validated one by one so a bad item only fails itself
+    notifications: List[Dict[str, Any]] = Field(..., min_length=1, description="Send requests to deliver")
+
+
+class NotificationBatchGetRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=100, description="Notification IDs to fetch")
+
+
+class DeadLetterReplayRequest(BaseModel):
+    ids: Optional[List[str]] = Field(None, description="Notification IDs to replay; omit to replay the oldest")
+    limit: int = Field(1000, ge=1, le=10000, description="Maximum items to replay when ids is omitted")
 
 
 class NotificationListResponse(BaseModel):
     notifications: List[NotificationResponse]
     total: int
-    page: int
+    page: Optional[int] = None
     limit: int
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = None
+
+
+class NotificationListEnvelope(BaseModel):
+    success: bool
+    message: str
+    data: NotificationListResponse
+
+
+class NotificationBatchGetResponse(BaseModel):
+    notifications: List[NotificationResponse]
+    not_found: List[str]
+
+
+class NotificationBatchGetEnvelope(BaseModel):
+    success: bool
+    message: str
+    data: NotificationBatchGetResponse
 
 
 class NotificationTemplate(BaseModel):
@@ -93,62 +149,57 @@ class EventNotification(BaseModel):
     data: Dict[str, Any]
 
 
-# Standard notification templates
+# Standard notification templates. The title, body and HTML of each live in
+# {EMAIL_TEMPLATE_DIR}/{name}.j2 and are rendered by the template service
 NOTIFICATION_TEMPLATES = {
     "user_registered": {
         "name": "User Registration",
         "type": NotificationType.EMAIL,
-        "title_template": "Welcome to Library Management System!",
-        "message_template": "Hello {first_name}, welcome to our library! Your account has been created successfully.",
         "variables": ["first_name", "email"]
     },
     "admin_registered": {
         "name": "Admin Registration",
         "type": NotificationType.EMAIL,
-        "title_template": "New Admin Account Created",
-        "message_template": "Hello {first_name}, your {role} account has been created by {created_by}.",
         "variables": ["first_name", "role", "created_by"]
     },
     "reservation_created": {
         "name": "Book Reserved",
         "type": NotificationType.SYSTEM,
-        "title_template": "Book Reserved Successfully",
-        "message_template": "You have successfully reserved '{book_title}' by {book_author}. Due date: {due_date}",
         "variables": ["book_title", "book_author", "due_date"]
     },
     "reservation_due_soon": {
         "name": "Book Due Soon",
         "type": NotificationType.SYSTEM,
-        "title_template": "Book Due Tomorrow",
-        "message_template": "Your book '{book_title}' is due tomorrow ({due_date}). Please return it on time.",
         "variables": ["book_title", "due_date"]
     },
     "reservation_overdue": {
         "name": "Book Overdue",
         "type": NotificationType.SYSTEM,
-        "title_template": "Book Overdue",
-        "message_template": "Your book '{book_title}' is overdue since {due_date}. Please return it immediately.",
         "variables": ["book_title", "due_date"]
     },
     "reservation_returned": {
         "name": "Book Returned",
         "type": NotificationType.SYSTEM,
-        "title_template": "Book Returned Successfully",
-        "message_template": "You have successfully returned '{book_title}'. Thank you!",
         "variables": ["book_title"]
     },
     "user_suspended": {
         "name": "Account Suspended",
         "type": NotificationType.SYSTEM,
-        "title_template": "Account Suspended",
-        "message_template": "Your account has been suspended. Reason: {reason}. Please contact the library.",
         "variables": ["reason"]
     },
     "book_available": {
         "name": "Book Available",
         "type": NotificationType.SYSTEM,
-        "title_template": "Book Now Available",
-        "message_template": "The book '{book_title}' you were waiting for is now available for reservation.",
         "variables": ["book_title"]
+    },
+    "reservation_overdue_digest": {
+        "name": "Books Overdue",
+        "type": NotificationType.SYSTEM,
+        "variables": ["count", "items"]
+    },
+    "digest": {
+        "name": "Notification Digest",
+        "type": NotificationType.SYSTEM,
+        "variables": ["count", "items"]
     }
 } 
\ No newline at end of file
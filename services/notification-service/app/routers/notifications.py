@@ -1,14 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, Path
+from fastapi import APIRouter, HTTPException, Depends, Query, Path, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import ValidationError
 from typing import Optional
 from datetime import datetime
 
 from app.models.notification import (
     NotificationCreate,
     NotificationSendRequest,
+    NotificationBatchSendRequest,
+    NotificationBatchGetRequest,
+    NotificationListEnvelope,
+    DeadLetterReplayRequest,
+    NotificationBatchGetEnvelope,
     NotificationStatus
 )
 from app.services.notification_service import notification_service
-from app.utils.auth import verify_token, verify_service_token
+from app.services.event_service import event_service
+from app.services.cleanup_service import cleanup_service
+from app.services.scheduler_service import scheduler_service
+from app.services.stream_service import stream_service
+from app.core.config import settings
+from app.utils.auth import verify_token, verify_service_token, token_cache
+from app.utils.rate_limit import enforce_rate_limit, rate_limit
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
@@ -39,23 +52,14 @@ async def health_check():
         raise HTTPException(status_code=503, detail=f"Service unhealthy: {str(e)}")
 
 
-@router.post("/send", response_model=dict)
+@router.post("/send", response_model=dict, dependencies=[Depends(rate_limit("send"))])
 async def send_notification(
     request: NotificationSendRequest,
     _: dict = Depends(verify_service_token)
 ):
     """Send a notification (service-to-service endpoint)"""
     try:
-        notification_data = NotificationCreate(
-            type=request.type,
-            recipient_id=request.recipient,
-            title=request.title,
-            message=request.message,
-            priority=request.priority,
-            data=request.data
-        )
-        
-        notification = await notification_service.create_notification(notification_data)
+        notification = await notification_service.create_notification(_to_notification_create(request))
         
         return {
             "success": True,
@@ -66,12 +70,89 @@ async def send_notification(
         raise HTTPException(status_code=500, detail=f"Failed to send notification: {str(e)}")
 
 
-@router.get("/user/{user_id}", response_model=dict)
+@router.post("/send/batch", response_model=dict)
+async def send_notification_batch(
+    request: NotificationBatchSendRequest,
+    http_request: Request,
+    _: dict = Depends(verify_service_token)
+):
+    """Send many notifications in one call (service-to-service endpoint)"""
+    if len(request.notifications) > settings.SEND_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: at most {settings.SEND_BATCH_MAX_SIZE} notifications per request"
+        )
+    # Each item costs what a single send does
+    await enforce_rate_limit(http_request, "send", cost=max(len(request.notifications), 1))
+    
+    results = []
+    valid = []
+    for index, item in enumerate(request.notifications):
+        try:
+            notification_data = _to_notification_create(NotificationSendRequest.model_validate(item))
+        except ValidationError as e:
+            results.append({
+                "index": index,
+                "success": False,
+                "error": "; ".join(_format_validation_error(err) for err in e.errors())
+            })
+            continue
+        results.append(None)
+        valid.append((index, notification_data))
+    
+    # All valid items are persisted together in a single pipelined transaction
+    try:
+        notifications = await notification_service.create_notifications([data for _, data in valid])
+        for (index, _), notification in zip(valid, notifications):
+            results[index] = {"index": index, "success": True, "notification_id": notification.id}
+    except Exception as e:
+        for index, _ in valid:
+            results[index] = {"index": index, "success": False, "error": f"Failed to send notification: {str(e)}"}
+    
+    sent = sum(1 for result in results if result["success"])
+    
+    return {
+        "success": True,
+        "message": f"Sent {sent} of {len(results)} notifications",
+        "data": {
+            "sent": sent,
+            "failed": len(results) - sent,
+            "results": results
+        }
+    }
+
+
+def _to_notification_create(request: NotificationSendRequest) -> NotificationCreate:
+    """Convert a service send request into notification creation data"""
+    return NotificationCreate(
+        type=request.type,
+        recipient_id=request.recipient,
+        recipient_email=request.recipient_email,
+        title=request.title,
+        message=request.message,
+        priority=request.priority,
+        data=request.data,
+        scheduled_at=request.scheduled_at
+    )
+
+
+def _format_validation_error(err: dict) -> str:
+    """One pydantic error as "field: message"; model-level errors have no field"""
+    if not err["loc"]:
+        return err["msg"]
+    return f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}"
+
+
+# List endpoints build plain dicts straight from Redis and return them as an
+# ORJSONResponse, so neither model validation nor jsonable_encoder runs per
+# item; the response models only document the shape.
+@router.get("/user/{user_id}", response_model=NotificationListEnvelope, dependencies=[Depends(rate_limit("read"))])
 async def get_user_notifications(
     user_id: str = Path(..., description="User ID"),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(20, ge=1, le=100, description="Items per page"),
     status: Optional[NotificationStatus] = Query(None, description="Filter by status"),
+    cursor: Optional[str] = Query(None, description="Resume after this next_cursor (overrides page)"),
     current_user: dict = Depends(verify_token)
 ):
     """Get notifications for a specific user"""
@@ -84,19 +165,50 @@ async def get_user_notifications(
             user_id=user_id,
             page=page,
             limit=limit,
-            status_filter=status
+            status_filter=status,
+            raw=True,
+            cursor=cursor
         )
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "message": "Notifications retrieved successfully",
             "data": result
-        }
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve notifications: {str(e)}")
 
 
-@router.get("/{notification_id}", response_model=dict)
+@router.post("/batch-get", response_model=NotificationBatchGetEnvelope, dependencies=[Depends(rate_limit("read"))])
+async def batch_get_notifications(
+    request: NotificationBatchGetRequest,
+    current_user: dict = Depends(verify_token)
+):
+    """Get several notifications by ID in one call"""
+    try:
+        notifications = await notification_service.get_notifications(request.ids, raw=True)
+        
+        # Only return the caller's own notifications, unless they are an admin
+        if current_user["role"] not in ["admin", "super_admin", "librarian"]:
+            notifications = [n for n in notifications if n["recipient_id"] == current_user["user_id"]]
+        
+        found_ids = {n["id"] for n in notifications}
+        
+        return ORJSONResponse({
+            "success": True,
+            "message": "Notifications retrieved successfully",
+            "data": {
+                "notifications": notifications,
+                "not_found": [i for i in request.ids if i not in found_ids]
+            }
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve notifications: {str(e)}")
+
+
+@router.get("/{notification_id}", response_model=dict, dependencies=[Depends(rate_limit("read"))])
 async def get_notification(
     notification_id: str = Path(..., description="Notification ID"),
     current_user: dict = Depends(verify_token)
@@ -187,7 +299,7 @@ async def delete_notification(
         raise HTTPException(status_code=500, detail=f"Failed to delete notification: {str(e)}")
 
 
-@router.get("/user/{user_id}/unread-count", response_model=dict)
+@router.get("/user/{user_id}/unread-count", response_model=dict, dependencies=[Depends(rate_limit("read"))])
 async def get_unread_count(
     user_id: str = Path(..., description="User ID"),
     current_user: dict = Depends(verify_token)
@@ -209,6 +321,43 @@ async def get_unread_count(
         raise HTTPException(status_code=500, detail=f"Failed to get unread count: {str(e)}")
 
 
+@router.get("/user/{user_id}/stream", dependencies=[Depends(rate_limit("read"))])
+async def stream_user_notifications(
+    user_id: str = Path(..., description="User ID"),
+    current_user: dict = Depends(verify_token)
+):
+    """Stream new notifications and unread count changes as server-sent events"""
+    # Only allow users to stream their own notifications, or admins any
+    if current_user["user_id"] != user_id and current_user["role"] not in ["admin", "super_admin", "librarian"]:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    try:
+        queue = await stream_service.open(user_id)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Failed to open notification stream: {str(e)}")
+    if queue is None:
+        raise HTTPException(status_code=503, detail="Notification stream unavailable")
+    
+    async def events():
+        try:
+            # Subscribed before reading the count, so no change is missed in between
+            count = await notification_service.get_unread_count(user_id)
+            yield f"event: unread_count\ndata: {{\"unread_count\":{count}}}\n\n"
+            while True:
+                frame = await queue.get()
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            await stream_service.close(user_id, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/templates", response_model=dict)
 async def get_notification_templates(
     current_user: dict = Depends(verify_token)
@@ -229,22 +378,134 @@ async def get_notification_templates(
         raise HTTPException(status_code=500, detail=f"Failed to retrieve templates: {str(e)}")
 
 
+@router.get("/events/stats", response_model=dict)
+async def get_event_consumer_stats(
+    current_user: dict = Depends(verify_token)
+):
+    """Get per-queue event consumer statistics (admin only)"""
+    if current_user["role"] not in ["admin", "super_admin"]:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return {
+        "success": True,
+        "message": "Event consumer statistics retrieved successfully",
+        "data": {
+            "connected": event_service.is_connected,
+            "queues": event_service.get_consumer_stats()
+        }
+    }
+
+
+@router.get("/scheduler/stats", response_model=dict)
+async def get_scheduler_stats(
+    current_user: dict = Depends(verify_token)
+):
+    """Get scheduled delivery backlog and lag (admin only)"""
+    if current_user["role"] not in ["admin", "super_admin"]:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return {
+        "success": True,
+        "message": "Scheduler statistics retrieved successfully",
+        "data": await scheduler_service.get_stats()
+    }
+
+
+@router.get("/email/dead-letter", response_model=dict)
+async def list_dead_letters(
+    page: int = Query(1, ge=1, description="Page number"),
+    limit: int = Query(20, ge=1, le=100, description="Items per page"),
+    current_user: dict = Depends(verify_token)
+):
+    """List email notifications that exhausted their retries (admin only)"""
+    if current_user["role"] not in ["admin", "super_admin"]:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        result = await notification_service.get_dead_letters(page=page, limit=limit)
+        
+        return ORJSONResponse({
+            "success": True,
+            "message": "Dead-lettered notifications retrieved successfully",
+            "data": result
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve dead-lettered notifications: {str(e)}")
+
+
+@router.post("/email/dead-letter/replay", response_model=dict)
+async def replay_dead_letters(
+    request: DeadLetterReplayRequest,
+    current_user: dict = Depends(verify_token)
+):
+    """Re-queue dead-lettered email notifications for delivery (admin only)"""
+    if current_user["role"] not in ["admin", "super_admin"]:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        result = await notification_service.replay_dead_letters(request.ids, limit=request.limit)
+        
+        return {
+            "success": True,
+            "message": f"Replayed {result['replayed']} dead-lettered notifications",
+            "data": result
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to replay dead-lettered notifications: {str(e)}")
+
+
+@router.get("/auth/token-cache", response_model=dict)
+async def get_token_cache_stats(
+    current_user: dict = Depends(verify_token)
+):
+    """Get verified-token cache statistics (admin only)"""
+    if current_user["role"] not in ["admin", "super_admin"]:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return {
+        "success": True,
+        "message": "Token cache statistics retrieved successfully",
+        "data": token_cache.stats()
+    }
+
+
 @router.post("/cleanup", response_model=dict)
 async def cleanup_old_notifications(
     days: int = Query(30, ge=1, le=365, description="Delete notifications older than this many days"),
     current_user: dict = Depends(verify_token)
 ):
-    """Clean up old notifications (admin only)"""
+    """Queue a background cleanup job for old notifications (admin only)"""
     if current_user["role"] not in ["admin", "super_admin"]:
         raise HTTPException(status_code=403, detail="Admin access required")
     
     try:
-        deleted_count = await notification_service.cleanup_old_notifications(days)
+        job = await cleanup_service.create_job(days)
         
         return {
             "success": True,
-            "message": f"Cleaned up {deleted_count} old notifications",
-            "data": {"deleted_count": deleted_count}
+            "message": "Cleanup job queued",
+            "data": job
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to cleanup notifications: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to cleanup notifications: {str(e)}")
+
+
+@router.get("/cleanup/{job_id}", response_model=dict)
+async def get_cleanup_job(
+    job_id: str = Path(..., description="Cleanup job ID"),
+    current_user: dict = Depends(verify_token)
+):
+    """Get the status of a cleanup job (admin only)"""
+    if current_user["role"] not in ["admin", "super_admin"]:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    job = await cleanup_service.get_job(job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Cleanup job not found")
+    
+    return {
+        "success": True,
+        "message": "Cleanup job retrieved successfully",
+        "data": job
+    } 
\ No newline at end of file
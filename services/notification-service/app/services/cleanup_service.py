@@ -0,0 +1,287 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from loguru import logger
+
+from app.core.config import settings
+from app.core.database import redis_manager
+from app.services.notification_service import notification_service
+
+
+# Extend the worker lease only while we still hold it
+RENEW_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Release the worker lease only if we still hold it
+RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class CleanupLeaseLost(Exception):
+    """Raised when another replica has taken over the cleanup worker lease"""
+
+
+class CleanupService:
+    """Background engine that deletes notifications older than a retention window.
+
+    Jobs are queued in Redis and executed by whichever replica holds the worker
+    lease. A job streams ``user_notifications:*`` keys with SCAN, prunes index
+    entries whose hashes expired under their own retention (so unread counters
+    stay right for users who never list), purges each user's notifications
+    older than the job's cutoff in pipelined UNLINK batches, throttles itself
+    to ``CLEANUP_MAX_OPS_PER_SECOND`` deletions, and checkpoints its SCAN cursor
+    so another replica can resume it after a crash.
+    """
+
+    def __init__(self):
+        self.job_prefix = "cleanup_job:"
+        self.queue_key = "cleanup_jobs:queue"
+        self.active_key = "cleanup_jobs:active"
+        self.lease_key = "cleanup_jobs:lease"
+        self.schedule_key = "cleanup_jobs:schedule"
+        self.job_ttl = 7 * 24 * 3600
+        self.worker_id = str(uuid.uuid4())
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    async def start(self):
+        """Start the background worker loop"""
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._run_loop())
+            logger.info("Started cleanup worker")
+
+    async def stop(self):
+        """Stop the background worker loop; an interrupted job resumes from its checkpoint"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            logger.info("Stopped cleanup worker")
+
+    async def create_job(self, days: int, trigger: str = "manual") -> Dict[str, Any]:
+        """Queue a cleanup job and return its initial state"""
+        redis_client = await redis_manager.get_client()
+        if not redis_client:
+            raise Exception("Redis connection not available")
+
+        now = datetime.utcnow()
+        job = {
+            "id": str(uuid.uuid4()),
+            "status": "queued",
+            "trigger": trigger,
+            "days": str(days),
+            "cutoff": (now - timedelta(days=days)).isoformat(),
+            "cursor": "0",
+            "users_scanned": "0",
+            "deleted_count": "0",
+            "pruned_count": "0",
+            "created_at": now.isoformat(),
+            "updated_at": now.isoformat(),
+        }
+
+        job_key = f"{self.job_prefix}{job['id']}"
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.hset(job_key, mapping=job)
+            pipe.expire(job_key, self.job_ttl)
+            pipe.rpush(self.queue_key, job["id"])
+            await pipe.execute()
+
+        self._wakeup.set()
+        logger.info(f"Queued cleanup job {job['id']} for notifications older than {days} days")
+        return self._format_job(job)
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get the current state of a cleanup job"""
+        redis_client = await redis_manager.get_client()
+        if not redis_client:
+            return None
+
+        job = await redis_client.hgetall(f"{self.job_prefix}{job_id}")
+        return self._format_job(job) if job else None
+
+    async def _run_loop(self):
+        while True:
+            try:
+                redis_client = await redis_manager.get_client()
+                if redis_client:
+                    await self._schedule_periodic_job(redis_client)
+                    if await redis_client.set(self.lease_key, self.worker_id, nx=True, ex=settings.CLEANUP_LEASE_SECONDS):
+                        try:
+                            await self._run_pending_jobs(redis_client)
+                        finally:
+                            await redis_client.eval(RELEASE_LEASE_SCRIPT, 1, self.lease_key, self.worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cleanup worker error: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.CLEANUP_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _schedule_periodic_job(self, redis_client):
+        """Queue the periodic CLEANUP_DAYS job, at most once per interval across replicas"""
+        interval = int(settings.CLEANUP_INTERVAL_HOURS * 3600)
+        if interval <= 0:
+            return
+        if await redis_client.set(self.schedule_key, self.worker_id, nx=True, ex=interval):
+            await self.create_job(settings.CLEANUP_DAYS, trigger="scheduled")
+
+    async def _run_pending_jobs(self, redis_client):
+        """Resume an interrupted job, then drain the job queue"""
+        while True:
+            job_id = await redis_client.get(self.active_key)
+            if not job_id:
+                job_id = await redis_client.lpop(self.queue_key)
+                if not job_id:
+                    return
+                await redis_client.set(self.active_key, job_id)
+
+            # On shutdown the job stays active so the next lease holder resumes it
+            await self._run_job(redis_client, job_id)
+            await redis_client.delete(self.active_key)
+
+    async def _run_job(self, redis_client, job_id: str):
+        job_key = f"{self.job_prefix}{job_id}"
+        job = await redis_client.hgetall(job_key)
+        if not job or job["status"] in ("completed", "failed"):
+            return
+
+        cutoff_timestamp = datetime.fromisoformat(job["cutoff"]).timestamp()
+        cursor = int(job["cursor"])
+        users_scanned = int(job["users_scanned"])
+        deleted_count = int(job["deleted_count"])
+        pruned_count = int(job.get("pruned_count", 0))
+        resumed = job["status"] == "running"
+
+        await redis_client.hset(job_key, mapping={
+            "status": "running",
+            "started_at": job.get("started_at") or datetime.utcnow().isoformat(),
+            "updated_at": datetime.utcnow().isoformat(),
+        })
+        logger.info(f"{'Resuming' if resumed else 'Starting'} cleanup job {job_id} at cursor {cursor}")
+
+        pattern = f"{notification_service.user_notifications_prefix}*"
+        prefix_length = len(notification_service.user_notifications_prefix)
+        throttle_started = time.monotonic()
+        throttle_ops = 0
+        lease_renewed = time.monotonic()
+
+        try:
+            while True:
+                cursor, user_keys = await redis_client.scan(
+                    cursor=cursor, match=pattern, count=settings.CLEANUP_SCAN_COUNT
+                )
+
+                for user_key in user_keys:
+                    # Hashes expire under their own retention; drop what they
+                    # left in the indexes and unread counter
+                    checked, pruned = await notification_service.prune_expired_notifications(
+                        redis_client, user_key[prefix_length:], limit=settings.CLEANUP_BATCH_SIZE
+                    )
+                    pruned_count += pruned
+                    throttle_ops += checked
+
+                    while True:
+                        deleted = await notification_service.purge_user_notifications(
+                            redis_client,
+                            user_key[prefix_length:],
+                            cutoff_timestamp,
+                            limit=settings.CLEANUP_BATCH_SIZE
+                        )
+                        deleted_count += deleted
+                        throttle_ops += deleted + 1
+
+                        # Pace deletions to CLEANUP_MAX_OPS_PER_SECOND
+                        expected = throttle_ops / settings.CLEANUP_MAX_OPS_PER_SECOND
+                        elapsed = time.monotonic() - throttle_started
+                        if expected > elapsed:
+                            await asyncio.sleep(expected - elapsed)
+
+                        if time.monotonic() - lease_renewed > settings.CLEANUP_LEASE_SECONDS / 3:
+                            await self._renew_lease(redis_client)
+                            lease_renewed = time.monotonic()
+
+                        if deleted < settings.CLEANUP_BATCH_SIZE:
+                            break
+
+                users_scanned += len(user_keys)
+
+                # Checkpoint after every SCAN page so the job can be resumed
+                await redis_client.hset(job_key, mapping={
+                    "cursor": str(cursor),
+                    "users_scanned": str(users_scanned),
+                    "deleted_count": str(deleted_count),
+                    "pruned_count": str(pruned_count),
+                    "updated_at": datetime.utcnow().isoformat(),
+                })
+                await self._renew_lease(redis_client)
+                lease_renewed = time.monotonic()
+
+                if cursor == 0:
+                    break
+
+            await redis_client.hset(job_key, mapping={
+                "status": "completed",
+                "completed_at": datetime.utcnow().isoformat(),
+                "updated_at": datetime.utcnow().isoformat(),
+            })
+            logger.info(
+                f"Cleanup job {job_id} completed: {deleted_count} notifications deleted, "
+                f"{pruned_count} expired index entries pruned"
+            )
+
+        except (asyncio.CancelledError, CleanupLeaseLost):
+            # Left as running with its checkpoint; the next lease holder resumes it
+            raise
+        except Exception as e:
+            await redis_client.hset(job_key, mapping={
+                "status": "failed",
+                "error": str(e),
+                "updated_at": datetime.utcnow().isoformat(),
+            })
+            logger.error(f"Cleanup job {job_id} failed: {e}")
+
+    async def _renew_lease(self, redis_client):
+        """Extend the worker lease, aborting the job if another replica took it over"""
+        renewed = await redis_client.eval(
+            RENEW_LEASE_SCRIPT, 1, self.lease_key, self.worker_id, settings.CLEANUP_LEASE_SECONDS
+        )
+        if not renewed:
+            raise CleanupLeaseLost(f"Cleanup worker {self.worker_id} lost its lease")
+
+    def _format_job(self, job: Dict[str, str]) -> Dict[str, Any]:
+        """Convert a stored job hash into an API-friendly dict"""
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "trigger": job.get("trigger", "manual"),
+            "days": int(job["days"]),
+            "cutoff": job["cutoff"],
+            "users_scanned": int(job.get("users_scanned", 0)),
+            "deleted_count": int(job.get("deleted_count", 0)),
+            "pruned_count": int(job.get("pruned_count", 0)),
+            "created_at": job["created_at"],
+            "started_at": job.get("started_at"),
+            "completed_at": job.get("completed_at"),
+            "updated_at": job.get("updated_at"),
+            "error": job.get("error"),
+        }
+
+
+# Global cleanup service instance
+cleanup_service = CleanupService()
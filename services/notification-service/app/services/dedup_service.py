@@ -0,0 +1,109 @@
+import hashlib
+from typing import Iterable, List, Optional, Sequence, Set
+from aio_pika.abc import AbstractIncomingMessage
+from loguru import logger
+
+from app.core.config import settings
+from app.core.database import redis_manager
+
+
+# Verdicts for the events of a batch
+NEW = "new"
+CLAIMED = "claimed"
+DUPLICATE = "duplicate"
+
+
+class DedupService:
+    """Detects events that were already turned into notifications.
+
+    AMQP delivery is at-least-once, so an event can arrive again after a
+    reconnect or from a publisher that retried. Each event is keyed on its
+    AMQP message ID, or a hash of its body when it has none, and is claimed
+    with a ``processed_events:{queue}:...`` marker (SET NX, expiring after
+    ``EVENT_DEDUP_WINDOW_SECONDS``) before its notification is written. All
+    events of a batch are claimed in one pipelined round trip, so repeats are
+    caught whichever replica or process handled the first copy; an event
+    whose marker already exists is a duplicate. Repeats of an event this
+    replica is still writing are dropped before reaching Redis. If Redis
+    cannot be checked, events are processed, since duplicates are better than
+    lost notifications.
+    """
+
+    def __init__(self):
+        self.key_prefix = "processed_events:"
+        # Keys of events whose notifications are being written by this replica
+        self._in_flight: Set[str] = set()
+
+    def event_key(self, queue_name: str, message: AbstractIncomingMessage) -> Optional[str]:
+        """The marker key of a delivery's event, or None when deduplication is off"""
+        if not settings.EVENT_DEDUP_ENABLED:
+            return None
+        if message.message_id:
+            return f"{self.key_prefix}{queue_name}:id:{message.message_id}"
+        return f"{self.key_prefix}{queue_name}:body:{hashlib.blake2b(message.body, digest_size=16).hexdigest()}"
+
+    async def check(self, keys: Sequence[str]) -> List[str]:
+        """Classify events by key, in order, as CLAIMED, DUPLICATE or (Redis unavailable) NEW.
+
+        CLAIMED events have their marker and should be released if their
+        notifications cannot be written; NEW events still need it written with
+        ``queue_mark``. Call ``finish`` with the keys once the write is done
+        either way.
+        """
+        verdicts = []
+        to_claim = []
+        for key in keys:
+            if key in self._in_flight:
+                # Another copy is being written right now
+                verdicts.append(DUPLICATE)
+                continue
+            to_claim.append(len(verdicts))
+            verdicts.append(NEW)
+            self._in_flight.add(key)
+
+        if not to_claim:
+            return verdicts
+
+        try:
+            redis_client = await redis_manager.get_client()
+            if not redis_client:
+                raise Exception("Redis connection not available")
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for index in to_claim:
+                    pipe.set(keys[index], 1, nx=True, ex=settings.EVENT_DEDUP_WINDOW_SECONDS)
+                claimed = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Duplicate check unavailable, processing {len(to_claim)} possibly repeated events: {e}")
+            return verdicts
+
+        for index, was_claimed in zip(to_claim, claimed):
+            if not was_claimed:
+                verdicts[index] = DUPLICATE
+                self._in_flight.discard(keys[index])
+            else:
+                verdicts[index] = CLAIMED
+        return verdicts
+
+    def finish(self, keys: Iterable[str]) -> None:
+        """Forget events whose write has completed or failed"""
+        self._in_flight.difference_update(keys)
+
+    def queue_mark(self, pipe, keys: Sequence[str]) -> None:
+        """Queue writing the markers of events processed without a claim on a pipeline"""
+        for key in keys:
+            pipe.set(key, 1, ex=settings.EVENT_DEDUP_WINDOW_SECONDS)
+
+    async def release(self, keys: Sequence[str]) -> None:
+        """Drop claims on events whose notifications could not be written, so redeliveries are processed"""
+        if not keys:
+            return
+        try:
+            redis_client = await redis_manager.get_client()
+            if redis_client:
+                await redis_client.delete(*keys)
+        except Exception as e:
+            logger.error(f"Failed to release {len(keys)} event claims: {e}")
+
+
+# Global dedup service instance
+dedup_service = DedupService()
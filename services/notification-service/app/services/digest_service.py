@@ -0,0 +1,111 @@
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+
+from app.core.config import settings
+from app.models.notification import NotificationCreate, NotificationPriority
+from app.services.template_service import template_service
+
+
+# Notifications from the same template to the same recipient share a digest
+DigestKey = Tuple[str, str]
+
+# Generic digest template used when a template has no {name}_digest variant
+DEFAULT_DIGEST_TEMPLATE = "digest"
+
+# Field limits of NotificationCreate
+TITLE_MAX_LENGTH = 255
+MESSAGE_MAX_LENGTH = 2000
+
+PRIORITY_RANK = {priority: rank for rank, priority in enumerate(NotificationPriority)}
+
+
+class DigestService:
+    """Coalesces bursts of event notifications into per-user digests.
+
+    Templates listed in ``EVENT_DIGEST_WINDOWS`` are held per (template,
+    recipient) for their window, counted from the first event, so a burst
+    such as an overdue sweep becomes one notification, one write and at most
+    one email per user. A window that ends with a single notification emits
+    it unchanged. A digest is rendered from ``{template}_digest`` (or the
+    generic ``digest`` template) and lists what it replaces in ``data.items``.
+    The items are stored only there; ``template_variables`` adds them back
+    when the digest's template is rendered again, as for its email.
+    """
+
+    def digest_key(self, notification: NotificationCreate) -> Optional[DigestKey]:
+        """The digest a notification is held for, or None to write it right away"""
+        template = (notification.data or {}).get("template")
+        if template not in settings.EVENT_DIGEST_WINDOWS or notification.scheduled_at is not None:
+            return None
+        return template, notification.recipient_id
+
+    def window(self, key: DigestKey) -> float:
+        """Seconds a digest collects notifications after its first one"""
+        return settings.EVENT_DIGEST_WINDOWS[key[0]]
+
+    def template_variables(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Variables to render a notification's template with, including a digest's items"""
+        variables = data.get("template_variables") or {}
+        if "digest_of" in data:
+            variables = {**variables, "items": data.get("items") or []}
+        return variables
+
+    def coalesce(self, notifications: List[NotificationCreate]) -> List[NotificationCreate]:
+        """Merge a digest's notifications into one; they are kept as they are if it cannot be rendered"""
+        if len(notifications) < 2:
+            return notifications
+        try:
+            return [self._merge(notifications)]
+        except Exception as e:
+            logger.error(f"Failed to build digest of {len(notifications)} notifications, writing them separately: {e}")
+            return notifications
+
+    def _merge(self, notifications: List[NotificationCreate]) -> NotificationCreate:
+        first = notifications[0]
+        template = first.data["template"]
+        digest_template = f"{template}_digest"
+        if not template_service.exists(digest_template):
+            digest_template = DEFAULT_DIGEST_TEMPLATE
+
+        items = [
+            {
+                "title": notification.title,
+                "message": notification.message,
+                "variables": notification.data.get("template_variables") or {},
+                "data": _item_data(notification.data)
+            }
+            for notification in notifications
+        ]
+        rendered = template_service.render(digest_template, {"count": len(items), "items": items}, html=False)
+
+        return NotificationCreate(
+            type=first.type,
+            recipient_id=first.recipient_id,
+            recipient_email=next((n.recipient_email for n in notifications if n.recipient_email), None),
+            title=_clip(rendered.title, TITLE_MAX_LENGTH),
+            message=_clip(rendered.body, MESSAGE_MAX_LENGTH),
+            priority=max((n.priority for n in notifications), key=PRIORITY_RANK.__getitem__),
+            data={
+                "event_type": first.data.get("event_type"),
+                "digest_of": template,
+                "items": items,
+                "template": digest_template,
+                "template_variables": {"count": len(items)}
+            }
+        )
+
+
+def _item_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    # Template keys move to the item's variables and event_type is the digest's
+    return {
+        key: value for key, value in data.items()
+        if key not in ("template", "template_variables", "event_type")
+    }
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+# Global digest service instance
+digest_service = DigestService()
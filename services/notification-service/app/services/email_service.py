@@ -0,0 +1,269 @@
+import asyncio
+from datetime import datetime
+from email.message import EmailMessage
+from typing import Dict, List, Optional, Tuple
+import aiosmtplib
+from loguru import logger
+
+from app.core.config import settings
+from app.core.database import redis_manager
+from app.models.notification import NotificationResponse, NotificationStatus
+from app.services.digest_service import digest_service
+from app.services.notification_service import notification_service
+from app.services.scheduler_service import CLAIM_DUE_SCRIPT
+from app.services.template_service import template_service
+
+
+class SMTPConnectionPool:
+    """Fixed-size pool of reusable SMTP connections.
+
+    Each slot holds one lazily opened connection that carries many messages
+    before it is recycled, so the TCP, TLS and AUTH handshakes are paid once
+    per ``messages_per_connection`` messages instead of once per message. The
+    number of slots is also the send concurrency.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        size: int,
+        messages_per_connection: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = False,
+        timeout: float = 30.0
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.size = size
+        self.messages_per_connection = messages_per_connection
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._slots: "asyncio.Queue[Tuple[Optional[aiosmtplib.SMTP], int]]" = asyncio.Queue()
+        for _ in range(size):
+            self._slots.put_nowait((None, 0))
+
+    @property
+    def in_use(self) -> int:
+        """Slots currently carrying a send"""
+        return self.size - self._slots.qsize()
+
+    async def send(self, message: EmailMessage) -> None:
+        """Send a message on a pooled connection, waiting for a free slot"""
+        client, sent = await self._slots.get()
+        try:
+            if client is None or not client.is_connected or sent >= self.messages_per_connection:
+                await self._close(client)
+                client, sent = await self._connect(), 0
+
+            try:
+                await client.send_message(message)
+            except aiosmtplib.SMTPServerDisconnected:
+                # The server dropped an idle connection: retry once on a fresh one
+                await self._close(client)
+                client, sent = await self._connect(), 0
+                await client.send_message(message)
+            sent += 1
+
+        except aiosmtplib.SMTPResponseException:
+            # The server rejected this message; the connection is still usable
+            raise
+        except Exception:
+            await self._close(client)
+            client, sent = None, 0
+            raise
+        finally:
+            self._slots.put_nowait((client, sent))
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            use_tls=self.use_tls,
+            timeout=self.timeout
+        )
+        await client.connect()
+        if self.username:
+            await client.login(self.username, self.password or "")
+        self.connections_opened += 1
+        return client
+
+    async def _close(self, client: Optional[aiosmtplib.SMTP]) -> None:
+        if client is None or not client.is_connected:
+            return
+        try:
+            await client.quit()
+        except Exception:
+            client.close()
+
+    async def close(self) -> None:
+        """Close every pooled connection"""
+        for _ in range(self.size):
+            client, _ = await self._slots.get()
+            await self._close(client)
+
+
+class EmailService:
+    """Background worker that delivers pending email notifications over SMTP.
+
+    New pending email notifications are queued in an outbox sorted set. The
+    worker claims batches from it with the same leased-claim script as the
+    scheduler, so every replica can run it, and sends each batch through an
+    ``SMTPConnectionPool``. Each notification is then marked sent, or its
+    failure is recorded, which re-queues it with backoff or dead-letters it.
+    """
+
+    def __init__(self):
+        self.pool: Optional[SMTPConnectionPool] = None
+        self._task: Optional[asyncio.Task] = None
+        self._concurrency: Optional[asyncio.Semaphore] = None
+        self.sent_total = 0
+        self.failed_total = 0
+
+    async def start(self):
+        """Start the background delivery loop if email delivery is enabled"""
+        if not settings.EMAIL_DELIVERY_ENABLED:
+            logger.info("Email delivery disabled")
+            return
+        if not self._task or self._task.done():
+            self.pool = SMTPConnectionPool(
+                hostname=settings.SMTP_HOST,
+                port=settings.SMTP_PORT,
+                size=settings.EMAIL_POOL_SIZE,
+                messages_per_connection=settings.EMAIL_MESSAGES_PER_CONNECTION,
+                username=settings.SMTP_USERNAME,
+                password=settings.SMTP_PASSWORD,
+                use_tls=settings.SMTP_USE_TLS,
+                timeout=settings.SMTP_TIMEOUT
+            )
+            # Also bounds the Redis writes that follow each send
+            self._concurrency = asyncio.Semaphore(settings.EMAIL_POOL_SIZE)
+            self._task = asyncio.create_task(self._run_loop())
+            logger.info(f"Started email delivery worker ({settings.EMAIL_POOL_SIZE} SMTP connections)")
+
+    async def stop(self):
+        """Stop the delivery loop and close pooled connections"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            logger.info("Stopped email delivery worker")
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+
+    async def _run_loop(self):
+        while True:
+            claimed = 0
+            try:
+                redis_client = await redis_manager.get_client()
+                if redis_client:
+                    claimed = await self.deliver_pending(redis_client)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Email delivery worker error: {e}")
+
+            # A full batch means more are probably waiting: keep going
+            if claimed < settings.EMAIL_BATCH_SIZE:
+                await asyncio.sleep(settings.EMAIL_POLL_INTERVAL)
+
+    async def deliver_pending(self, redis_client) -> int:
+        """Claim and deliver one batch from the outbox; returns how many were claimed"""
+        now = datetime.utcnow().timestamp()
+        claimed: List[str] = await redis_client.eval(
+            CLAIM_DUE_SCRIPT,
+            2,
+            notification_service.email_outbox_key,
+            notification_service.email_processing_key,
+            now,
+            now + settings.EMAIL_LEASE_SECONDS,
+            settings.EMAIL_BATCH_SIZE
+        )
+        if not claimed:
+            return 0
+
+        # Pending, or failed and due for a retry; anything else was handled
+        # already (or read, or deleted)
+        notifications = [
+            notification
+            for notification in await notification_service.get_notifications(claimed)
+            if notification.status in (NotificationStatus.PENDING, NotificationStatus.FAILED)
+        ]
+        html = self._render_html(notifications)
+        await asyncio.gather(*(
+            self._deliver(notification, html.get(notification.id)) for notification in notifications
+        ))
+
+        await redis_client.zrem(notification_service.email_processing_key, *claimed)
+        return len(claimed)
+
+    def _render_html(self, notifications: List[NotificationResponse]) -> Dict[str, str]:
+        """HTML bodies of a batch's templated notifications, rendered together"""
+        templated = [
+            notification for notification in notifications
+            if notification.data and notification.data.get("template")
+        ]
+        if not templated:
+            return {}
+        try:
+            rendered = template_service.render_batch(
+                (notification.data["template"], digest_service.template_variables(notification.data))
+                for notification in templated
+            )
+        except Exception as e:
+            # The plain-text message is complete on its own
+            logger.warning(f"Failed to render HTML for {len(templated)} emails, sending text only: {e}")
+            return {}
+        return {
+            notification.id: result.html
+            for notification, result in zip(templated, rendered)
+            if result.html
+        }
+
+    async def _deliver(self, notification: NotificationResponse, html: Optional[str] = None) -> None:
+        async with self._concurrency:
+            await self._send_and_mark(notification, html)
+
+    async def _send_and_mark(self, notification: NotificationResponse, html: Optional[str] = None) -> None:
+        try:
+            if not notification.recipient_email:
+                raise ValueError("Notification has no recipient email")
+            await self.pool.send(self.build_message(notification, html))
+        except Exception as e:
+            self.failed_total += 1
+            outcome = await notification_service.record_delivery_failure(
+                notification.id, str(e) or type(e).__name__, permanent=self._is_permanent(e)
+            )
+            logger.error(f"Failed to email notification {notification.id} ({outcome}): {e}")
+            return
+
+        self.sent_total += 1
+        await notification_service.mark_as_sent(notification.id)
+
+    def _is_permanent(self, error: Exception) -> bool:
+        """Whether retrying cannot help: no address, or a 5xx rejection from the server"""
+        if isinstance(error, (ValueError, aiosmtplib.SMTPRecipientsRefused)):
+            return True
+        return isinstance(error, aiosmtplib.SMTPResponseException) and error.code >= 500
+
+    def build_message(self, notification: NotificationResponse, html: Optional[str] = None) -> EmailMessage:
+        """Build the email for a notification, with an HTML alternative when one is given"""
+        message = EmailMessage()
+        message["From"] = settings.EMAIL_FROM
+        message["To"] = notification.recipient_email
+        message["Subject"] = notification.title
+        message.set_content(notification.message)
+        if html:
+            message.add_alternative(html, subtype="html")
+        return message
+
+
+# Global email service instance
+email_service = EmailService()
@@ -1,356 +1,374 @@
 import json
 import asyncio
-import pika
-import threading
-from typing import Dict, Any
-from datetime import datetime
+import aio_pika
+from dataclasses import dataclass, asdict
+from time import perf_counter
+from aio_pika.abc import (
+    AbstractChannel,
+    AbstractIncomingMessage,
+    AbstractRobustConnection
+)
+from typing import Awaitable, Callable, Dict, Any, List, Optional
 from loguru import logger
 
 from app.core.config import settings
+from app.core.metrics import event_metrics
 from app.models.notification import (
     NotificationCreate,
     NotificationType,
-    NotificationPriority,
-    NOTIFICATION_TEMPLATES
+    NotificationPriority
 )
-from app.services.notification_service import notification_service
+from app.services.dedup_service import dedup_service
+from app.services.ingestion_service import EventBatcher
+from app.services.template_service import template_service
+
+
+# Queues consumed by this service and the routing keys bound to each
+QUEUE_BINDINGS = {
+    'user_events': ['user.registered', 'user.profile_updated', 'user.suspended'],
+    'admin_events': ['admin.registered', 'admin.login'],
+    'book_events': ['book.created', 'book.updated', 'book.deleted'],
+    'reservation_events': ['reservation.created', 'reservation.returned', 'reservation.overdue', 'reservation.extended'],
+}
+
+
+@dataclass
+class QueueStats:
+    """Processing counters for a single consumed queue"""
+    prefetch: int
+    concurrency: int
+    in_flight: int = 0
+    waiting: int = 0
+    completed: int = 0
+    failed: int = 0
+    duplicates: int = 0
+    held: int = 0
+    coalesced: int = 0
 
 
 class EventService:
     def __init__(self):
-        self.connection = None
-        self.channel = None
+        self.connection: Optional[AbstractRobustConnection] = None
+        self.channels: Dict[str, AbstractChannel] = {}
         self.exchange = settings.RABBITMQ_EXCHANGE
-        self.is_connected = False
+        self._handlers: Dict[str, Callable[[str, Dict[str, Any]], Optional[NotificationCreate]]] = {
+            'user_events': self._handle_user_event,
+            'admin_events': self._handle_admin_event,
+            'book_events': self._handle_book_event,
+            'reservation_events': self._handle_reservation_event,
+        }
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.stats: Dict[str, QueueStats] = {}
+        self.batchers: Dict[str, EventBatcher] = {}
+        for queue_name in QUEUE_BINDINGS:
+            concurrency = settings.EVENT_QUEUE_CONCURRENCY.get(queue_name, settings.EVENT_CONCURRENCY)
+            self._semaphores[queue_name] = asyncio.Semaphore(concurrency)
+            self.stats[queue_name] = QueueStats(
+                prefetch=settings.EVENT_QUEUE_PREFETCH.get(queue_name, settings.EVENT_PREFETCH_COUNT),
+                concurrency=concurrency
+            )
+            self.batchers[queue_name] = EventBatcher(
+                queue_name,
+                self.stats[queue_name],
+                batch_size=settings.BATCH_SIZE,
+                linger=settings.EVENT_BATCH_LINGER_MS / 1000,
+                max_concurrent_flushes=concurrency
+            )
+
+    @property
+    def is_connected(self) -> bool:
+        """Whether the AMQP connection is currently open"""
+        return self.connection is not None and not self.connection.is_closed
 
     async def connect(self):
         """Connect to RabbitMQ"""
         try:
-            # Use blocking connection for RabbitMQ consumer
-            connection_params = pika.ConnectionParameters(
+            # Robust connections reconnect automatically and restore channels,
+            # exchanges, queues, bindings and consumers declared through them
+            self.connection = await aio_pika.connect_robust(
                 host=settings.RABBITMQ_HOST,
                 port=settings.RABBITMQ_PORT,
-                credentials=pika.PlainCredentials(
-                    settings.RABBITMQ_USERNAME,
-                    settings.RABBITMQ_PASSWORD
-                )
+                login=settings.RABBITMQ_USERNAME,
+                password=settings.RABBITMQ_PASSWORD,
+                reconnect_interval=settings.RABBITMQ_RECONNECT_INTERVAL
             )
-            
-            self.connection = pika.BlockingConnection(connection_params)
-            self.channel = self.connection.channel()
-            
-            # Declare exchange
-            self.channel.exchange_declare(
-                exchange=self.exchange,
-                exchange_type='topic',
-                durable=True
-            )
-            
-            # Declare queues for different event types
-            self._declare_queues()
-            
-            self.is_connected = True
+            self.connection.close_callbacks.add(self._on_connection_lost)
+            self.connection.reconnect_callbacks.add(self._on_reconnect)
+
             logger.info("Connected to RabbitMQ successfully")
-            
+
         except Exception as e:
             logger.error(f"Failed to connect to RabbitMQ: {e}")
-            self.is_connected = False
-
-    def _declare_queues(self):
-        """Declare queues for different event types"""
-        queues = [
-            ('user_events', ['user.registered', 'user.profile_updated', 'user.suspended']),
-            ('admin_events', ['admin.registered', 'admin.login']),
-            ('book_events', ['book.created', 'book.updated', 'book.deleted']),
-            ('reservation_events', ['reservation.created', 'reservation.returned', 'reservation.overdue', 'reservation.extended']),
-        ]
-        
-        for queue_name, routing_keys in queues:
-            # Declare queue
-            self.channel.queue_declare(queue=queue_name, durable=True)
-            
-            # Bind queue to exchange with routing keys
-            for routing_key in routing_keys:
-                routing_key_formatted = routing_key.replace('.', '_')
-                self.channel.queue_bind(
-                    exchange=self.exchange,
-                    queue=queue_name,
-                    routing_key=routing_key_formatted
-                )
+            self.connection = None
+
+    async def _declare_queue(self, channel: AbstractChannel, queue_name: str, routing_keys: List[str]):
+        """Declare a queue on the given channel and bind it to the exchange"""
+        exchange = await channel.declare_exchange(
+            self.exchange,
+            aio_pika.ExchangeType.TOPIC,
+            durable=True
+        )
+        queue = await channel.declare_queue(queue_name, durable=True)
+
+        # Bind queue to exchange with routing keys
+        for routing_key in routing_keys:
+            routing_key_formatted = routing_key.replace('.', '_')
+            await queue.bind(exchange, routing_key=routing_key_formatted)
+
+        return queue
 
     async def start_consuming(self):
-        """Start consuming events from RabbitMQ in a separate thread"""
+        """Start consuming events from RabbitMQ on the application event loop"""
         if not self.is_connected:
             await self.connect()
-            
+
         if not self.is_connected:
-            logger.error("Cannot start consuming - not connected to RabbitMQ")
+            logger.error("Cannot start consuming - not connected to RabbitMQ, retrying in background")
+            if not self._reconnect_task or self._reconnect_task.done():
+                self._reconnect_task = asyncio.create_task(self._connect_and_consume())
             return
 
-        # Run the blocking consumer in a separate thread
-        def consume_events():
-            try:
-                # Set up consumers for each queue
-                self.channel.basic_consume(
-                    queue='user_events',
-                    on_message_callback=self._handle_user_event,
-                    auto_ack=False
-                )
-                
-                self.channel.basic_consume(
-                    queue='admin_events',
-                    on_message_callback=self._handle_admin_event,
-                    auto_ack=False
-                )
-                
-                self.channel.basic_consume(
-                    queue='book_events',
-                    on_message_callback=self._handle_book_event,
-                    auto_ack=False
-                )
-                
-                self.channel.basic_consume(
-                    queue='reservation_events',
-                    on_message_callback=self._handle_reservation_event,
-                    auto_ack=False
+        # One channel per queue, so a slow queue never stalls the others and
+        # each queue gets its own prefetch window
+        for queue_name, routing_keys in QUEUE_BINDINGS.items():
+            channel = await self.connection.channel()
+            await channel.set_qos(prefetch_count=self.stats[queue_name].prefetch)
+            queue = await self._declare_queue(channel, queue_name, routing_keys)
+            await queue.consume(self._make_consumer(queue_name), no_ack=False)
+            self.channels[queue_name] = channel
+
+        logger.info("Started consuming events")
+
+    async def _connect_and_consume(self):
+        """Keep retrying the initial connection until the broker is reachable"""
+        while not self.is_connected:
+            await asyncio.sleep(settings.RABBITMQ_RECONNECT_INTERVAL)
+            await self.connect()
+        await self.start_consuming()
+
+    def _make_consumer(self, queue_name: str) -> Callable[[AbstractIncomingMessage], Awaitable[None]]:
+        """Wrap a queue handler with concurrency limits and hand its result to the batcher"""
+        handler = self._handlers[queue_name]
+        semaphore = self._semaphores[queue_name]
+        batcher = self.batchers[queue_name]
+        stats = self.stats[queue_name]
+
+        # Metric labels only take the routing keys bound to this queue
+        known_event_types = set(QUEUE_BINDINGS[queue_name])
+
+        async def consume(message: AbstractIncomingMessage):
+            # aio-pika starts a task per delivery; prefetch bounds how many
+            # wait here and the semaphore bounds how many run
+            batcher.track(message)
+            stats.waiting += 1
+            async with semaphore:
+                stats.waiting -= 1
+                started = perf_counter()
+                event_type = None
+                try:
+                    event_data = json.loads(message.body.decode('utf-8'))
+                    event_type = event_data.get('eventType')
+                    notification = handler(event_type, event_data.get('data', {}))
+                    outcome = "notification" if notification is not None else "ignored"
+                except Exception as e:
+                    logger.error(f"Error handling event from {queue_name}: {e}")
+                    outcome = "error"
+
+                duration, count = event_metrics(
+                    queue_name,
+                    event_type if event_type in known_event_types else "unknown",
+                    outcome
                 )
-                
-                logger.info("Starting to consume events...")
-                self.channel.start_consuming()
-                
-            except Exception as e:
-                logger.error(f"Error while consuming events: {e}")
-
-        # Start the consumer in a daemon thread
-        consumer_thread = threading.Thread(target=consume_events, daemon=True)
-        consumer_thread.start()
-        logger.info("Event consumer started in background thread")
-
-    def _handle_user_event(self, ch, method, properties, body):
+                duration.observe(perf_counter() - started)
+                count.inc()
+                if outcome == "error":
+                    await batcher.reject(message)
+                    return
+
+                # The batcher acks the message once its notification is persisted
+                event_key = dedup_service.event_key(queue_name, message) if notification is not None else None
+                batcher.submit(message, notification, event_key)
+
+        return consume
+
+    def get_consumer_stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-queue prefetch, concurrency and processing counters"""
+        return {queue_name: asdict(stats) for queue_name, stats in self.stats.items()}
+
+    async def queue_depths(self) -> Dict[str, int]:
+        """Messages ready in each bound queue on the broker, from a passive declare.
+
+        Uses a channel of its own: a failed passive declare closes its channel,
+        which must not be a consumer's.
+        """
+        if not self.is_connected:
+            return {}
+        depths = {}
+        async with self.connection.channel() as channel:
+            for queue_name in QUEUE_BINDINGS:
+                queue = await channel.declare_queue(queue_name, passive=True)
+                depths[queue_name] = queue.declaration_result.message_count
+        return depths
+
+    def _on_connection_lost(self, *args):
+        logger.warning("Lost connection to RabbitMQ, reconnecting...")
+
+    def _on_reconnect(self, *args):
+        # Deliveries from the old channels will be redelivered by the broker
+        for batcher in self.batchers.values():
+            batcher.reset()
+        logger.info("Reconnected to RabbitMQ, channels and consumers restored")
+
+    def _handle_user_event(self, event_type: str, data: Dict[str, Any]) -> Optional[NotificationCreate]:
         """Handle user-related events"""
-        try:
-            event_data = json.loads(body.decode('utf-8'))
-            event_type = event_data.get('eventType')
-            data = event_data.get('data', {})
-            
-            if event_type == 'user.registered':
-                asyncio.create_task(self._create_user_registered_notification(data))
-            elif event_type == 'user.suspended':
-                asyncio.create_task(self._create_user_suspended_notification(data))
-                
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            logger.info(f"Processed user event: {event_type}")
-            
-        except Exception as e:
-            logger.error(f"Error handling user event: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+        logger.debug(f"Received user event: {event_type}")
+
+        if event_type == 'user.registered':
+            return self._build_user_registered_notification(data)
+        elif event_type == 'user.suspended':
+            return self._build_user_suspended_notification(data)
+        return None
 
-    def _handle_admin_event(self, ch, method, properties, body):
+    def _handle_admin_event(self, event_type: str, data: Dict[str, Any]) -> Optional[NotificationCreate]:
         """Handle admin-related events"""
-        try:
-            event_data = json.loads(body.decode('utf-8'))
-            event_type = event_data.get('eventType')
-            data = event_data.get('data', {})
-            
-            if event_type == 'admin.registered':
-                asyncio.create_task(self._create_admin_registered_notification(data))
-                
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            logger.info(f"Processed admin event: {event_type}")
-            
-        except Exception as e:
-            logger.error(f"Error handling admin event: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+        logger.debug(f"Received admin event: {event_type}")
 
-    def _handle_book_event(self, ch, method, properties, body):
+        if event_type == 'admin.registered':
+            return self._build_admin_registered_notification(data)
+        return None
+
+    def _handle_book_event(self, event_type: str, data: Dict[str, Any]) -> Optional[NotificationCreate]:
         """Handle book-related events"""
-        try:
-            event_data = json.loads(body.decode('utf-8'))
-            event_type = event_data.get('eventType')
-            data = event_data.get('data', {})
-            
-            # For now, we'll just log book events
-            # In the future, we could notify users about new books, etc.
-            logger.info(f"Received book event: {event_type}")
-                
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            
-        except Exception as e:
-            logger.error(f"Error handling book event: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+        # For now, we'll just log book events
+        # In the future, we could notify users about new books, etc.
+        logger.info(f"Received book event: {event_type}")
+        return None
 
-    def _handle_reservation_event(self, ch, method, properties, body):
+    def _handle_reservation_event(self, event_type: str, data: Dict[str, Any]) -> Optional[NotificationCreate]:
         """Handle reservation-related events"""
-        try:
-            event_data = json.loads(body.decode('utf-8'))
-            event_type = event_data.get('eventType')
-            data = event_data.get('data', {})
-            
-            if event_type == 'reservation.created':
-                asyncio.create_task(self._create_reservation_created_notification(data))
-            elif event_type == 'reservation.returned':
-                asyncio.create_task(self._create_reservation_returned_notification(data))
-            elif event_type == 'reservation.overdue':
-                asyncio.create_task(self._create_reservation_overdue_notification(data))
-                
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            logger.info(f"Processed reservation event: {event_type}")
-            
-        except Exception as e:
-            logger.error(f"Error handling reservation event: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+        logger.debug(f"Received reservation event: {event_type}")
 
-    async def _create_user_registered_notification(self, data: Dict[str, Any]):
-        """Create notification for user registration"""
-        try:
-            template = NOTIFICATION_TEMPLATES["user_registered"]
-            
-            notification = NotificationCreate(
-                type=NotificationType.SYSTEM,
-                recipient_id=data["userId"],
-                recipient_email=data.get("email"),
-                title=template["title_template"],
-                message=template["message_template"].format(
-                    first_name=data.get("firstName", "User"),
-                    email=data.get("email", "")
-                ),
-                priority=NotificationPriority.MEDIUM,
-                data={"event_type": "user_registered", "user_data": data}
-            )
-            
-            await notification_service.create_notification(notification)
-            logger.info(f"Created user registration notification for {data['userId']}")
-            
-        except Exception as e:
-            logger.error(f"Error creating user registered notification: {e}")
+        if event_type == 'reservation.created':
+            return self._build_reservation_created_notification(data)
+        elif event_type == 'reservation.returned':
+            return self._build_reservation_returned_notification(data)
+        elif event_type == 'reservation.overdue':
+            return self._build_reservation_overdue_notification(data)
+        return None
 
-    async def _create_user_suspended_notification(self, data: Dict[str, Any]):
-        """Create notification for user suspension"""
-        try:
-            template = NOTIFICATION_TEMPLATES["user_suspended"]
-            
-            notification = NotificationCreate(
-                type=NotificationType.SYSTEM,
-                recipient_id=data["userId"],
-                title=template["title_template"],
-                message=template["message_template"].format(
-                    reason=data.get("reason", "No reason provided")
-                ),
-                priority=NotificationPriority.HIGH,
-                data={"event_type": "user_suspended", "suspension_data": data}
-            )
-            
-            await notification_service.create_notification(notification)
-            logger.info(f"Created user suspension notification for {data['userId']}")
-            
-        except Exception as e:
-            logger.error(f"Error creating user suspended notification: {e}")
+    def _build_notification(
+        self,
+        template_name: str,
+        recipient_id: str,
+        variables: Dict[str, Any],
+        priority: NotificationPriority,
+        data: Dict[str, Any],
+        recipient_email: Optional[str] = None
+    ) -> NotificationCreate:
+        """Render a template into a notification.
 
-    async def _create_admin_registered_notification(self, data: Dict[str, Any]):
-        """Create notification for admin registration"""
-        try:
-            template = NOTIFICATION_TEMPLATES["admin_registered"]
-            
-            notification = NotificationCreate(
-                type=NotificationType.SYSTEM,
-                recipient_id=data["adminId"],
-                recipient_email=data.get("email"),
-                title=template["title_template"],
-                message=template["message_template"].format(
-                    first_name=data.get("firstName", "Admin"),
-                    role=data.get("role", "admin"),
-                    created_by=data.get("createdBy", {}).get("email", "System")
-                ),
-                priority=NotificationPriority.MEDIUM,
-                data={"event_type": "admin_registered", "admin_data": data}
-            )
-            
-            await notification_service.create_notification(notification)
-            logger.info(f"Created admin registration notification for {data['adminId']}")
-            
-        except Exception as e:
-            logger.error(f"Error creating admin registered notification: {e}")
+        The template name and variables are kept in ``data`` so the email
+        worker can render the HTML variant if the notification is emailed.
+        """
+        rendered = template_service.render(template_name, variables, html=False)
+        return NotificationCreate(
+            type=NotificationType.SYSTEM,
+            recipient_id=recipient_id,
+            recipient_email=recipient_email,
+            title=rendered.title,
+            message=rendered.body,
+            priority=priority,
+            data={**data, "template": template_name, "template_variables": variables}
+        )
 
-    async def _create_reservation_created_notification(self, data: Dict[str, Any]):
-        """Create notification for reservation creation"""
-        try:
-            template = NOTIFICATION_TEMPLATES["reservation_created"]
-            
-            # We'd need to fetch book details from book service
-            # For now, using placeholder data
-            notification = NotificationCreate(
-                type=NotificationType.SYSTEM,
-                recipient_id=data["userId"],
-                title=template["title_template"],
-                message=template["message_template"].format(
-                    book_title=data.get("bookTitle", "Book"),
-                    book_author=data.get("bookAuthor", "Author"),
-                    due_date=data.get("dueDate", "")
-                ),
-                priority=NotificationPriority.MEDIUM,
-                data={"event_type": "reservation_created", "reservation_data": data}
-            )
-            
-            await notification_service.create_notification(notification)
-            logger.info(f"Created reservation notification for {data['userId']}")
-            
-        except Exception as e:
-            logger.error(f"Error creating reservation created notification: {e}")
+    def _build_user_registered_notification(self, data: Dict[str, Any]) -> NotificationCreate:
+        """Build notification for user registration"""
+        return self._build_notification(
+            "user_registered",
+            data["userId"],
+            {"first_name": data.get("firstName", "User"), "email": data.get("email", "")},
+            NotificationPriority.MEDIUM,
+            {"event_type": "user_registered", "user_data": data},
+            recipient_email=data.get("email")
+        )
 
-    async def _create_reservation_returned_notification(self, data: Dict[str, Any]):
-        """Create notification for book return"""
-        try:
-            template = NOTIFICATION_TEMPLATES["reservation_returned"]
-            
-            notification = NotificationCreate(
-                type=NotificationType.SYSTEM,
-                recipient_id=data["userId"],
-                title=template["title_template"],
-                message=template["message_template"].format(
-                    book_title=data.get("bookTitle", "Book")
-                ),
-                priority=NotificationPriority.LOW,
-                data={"event_type": "reservation_returned", "reservation_data": data}
-            )
-            
-            await notification_service.create_notification(notification)
-            logger.info(f"Created book return notification for {data['userId']}")
-            
-        except Exception as e:
-            logger.error(f"Error creating reservation returned notification: {e}")
+    def _build_user_suspended_notification(self, data: Dict[str, Any]) -> NotificationCreate:
+        """Build notification for user suspension"""
+        return self._build_notification(
+            "user_suspended",
+            data["userId"],
+            {"reason": data.get("reason", "No reason provided")},
+            NotificationPriority.HIGH,
+            {"event_type": "user_suspended", "suspension_data": data}
+        )
 
-    async def _create_reservation_overdue_notification(self, data: Dict[str, Any]):
-        """Create notification for overdue book"""
-        try:
-            template = NOTIFICATION_TEMPLATES["reservation_overdue"]
-            
-            notification = NotificationCreate(
-                type=NotificationType.SYSTEM,
-                recipient_id=data["userId"],
-                title=template["title_template"],
-                message=template["message_template"].format(
-                    book_title=data.get("bookTitle", "Book"),
-                    due_date=data.get("dueDate", "")
-                ),
-                priority=NotificationPriority.HIGH,
-                data={"event_type": "reservation_overdue", "reservation_data": data}
-            )
-            
-            await notification_service.create_notification(notification)
-            logger.info(f"Created overdue notification for {data['userId']}")
-            
-        except Exception as e:
-            logger.error(f"Error creating reservation overdue notification: {e}")
+    def _build_admin_registered_notification(self, data: Dict[str, Any]) -> NotificationCreate:
+        """Build notification for admin registration"""
+        return self._build_notification(
+            "admin_registered",
+            data["adminId"],
+            {
+                "first_name": data.get("firstName", "Admin"),
+                "role": data.get("role", "admin"),
+                "created_by": data.get("createdBy", {}).get("email", "System")
+            },
+            NotificationPriority.MEDIUM,
+            {"event_type": "admin_registered", "admin_data": data},
+            recipient_email=data.get("email")
+        )
+
+    def _build_reservation_created_notification(self, data: Dict[str, Any]) -> NotificationCreate:
+        """Build notification for reservation creation"""
+        # We'd need to fetch book details from book service
+        # For now, using placeholder data
+        return self._build_notification(
+            "reservation_created",
+            data["userId"],
+            {
+                "book_title": data.get("bookTitle", "Book"),
+                "book_author": data.get("bookAuthor", "Author"),
+                "due_date": data.get("dueDate", "")
+            },
+            NotificationPriority.MEDIUM,
+            {"event_type": "reservation_created", "reservation_data": data}
+        )
+
+    def _build_reservation_returned_notification(self, data: Dict[str, Any]) -> NotificationCreate:
+        """Build notification for book return"""
+        return self._build_notification(
+            "reservation_returned",
+            data["userId"],
+            {"book_title": data.get("bookTitle", "Book")},
+            NotificationPriority.LOW,
+            {"event_type": "reservation_returned", "reservation_data": data}
+        )
+
+    def _build_reservation_overdue_notification(self, data: Dict[str, Any]) -> NotificationCreate:
+        """Build notification for overdue book"""
+        return self._build_notification(
+            "reservation_overdue",
+            data["userId"],
+            {"book_title": data.get("bookTitle", "Book"), "due_date": data.get("dueDate", "")},
+            NotificationPriority.HIGH,
+            {"event_type": "reservation_overdue", "reservation_data": data}
+        )
 
-    def disconnect(self):
+    async def disconnect(self):
         """Disconnect from RabbitMQ"""
         try:
+            if self._reconnect_task and not self._reconnect_task.done():
+                self._reconnect_task.cancel()
+            # Persist and ack whatever is still buffered before closing
+            for batcher in self.batchers.values():
+                await batcher.drain()
             if self.connection and not self.connection.is_closed:
-                self.connection.close()
+                await self.connection.close()
                 logger.info("Disconnected from RabbitMQ")
+            self.channels = {}
         except Exception as e:
             logger.error(f"Error disconnecting from RabbitMQ: {e}")
 
 
 # Global event service instance
-event_service = EventService() 
\ No newline at end of file
+event_service = EventService()
@@ -0,0 +1,254 @@
+import asyncio
+import itertools
+from time import perf_counter
+from typing import Dict, List, Optional, Set, Tuple
+from loguru import logger
+from aio_pika.abc import AbstractIncomingMessage
+
+from app.core.config import settings
+from app.core.metrics import EVENT_BATCH_DURATION, EVENT_BATCHES, EVENT_BATCH_EVENTS
+from app.models.notification import NotificationCreate
+from app.services.dedup_service import CLAIMED, DUPLICATE, NEW, dedup_service
+from app.services.digest_service import DigestKey, digest_service
+from app.services.notification_service import notification_service
+
+
+# A handled delivery: the message, its notification (None if the event needs
+# none), its deduplication key (None when there is nothing to deduplicate)
+# and the digest window it is merged in (None when it is written on its own)
+BatchEntry = Tuple[AbstractIncomingMessage, Optional[NotificationCreate], Optional[str], Optional[int]]
+
+
+class EventBatcher:
+    """Micro-batching stage between one AMQP queue consumer and Redis.
+
+    Rendered events are buffered until ``batch_size`` is reached or ``linger``
+    seconds pass, persisted with a single pipelined write, and then acked
+    together. Events already persisted from an earlier delivery are acked
+    without being written again (see ``DedupService``). Notifications with a
+    digest window are held per user until it ends and written as one digest
+    (see ``DigestService``); their deliveries stay unacked until then. Every
+    delivery is tracked from the moment it arrives so the batch can be acked
+    with ``multiple=True`` only when no older delivery on the channel is
+    still unsettled.
+    """
+
+    def __init__(self, queue_name: str, stats, batch_size: int, linger: float, max_concurrent_flushes: int):
+        self.queue_name = queue_name
+        self.stats = stats
+        self.batch_size = batch_size
+        self.linger = linger
+        self._buffer: List[BatchEntry] = []
+        self._unsettled: Dict[int, AbstractIncomingMessage] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_semaphore = asyncio.Semaphore(max_concurrent_flushes)
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self._held: Dict[DigestKey, List[BatchEntry]] = {}
+        self._held_handles: Dict[DigestKey, asyncio.TimerHandle] = {}
+        self._window_ids = itertools.count()
+
+    @property
+    def buffered(self) -> int:
+        """Handled events waiting for the next flush"""
+        return len(self._buffer)
+
+    def track(self, message: AbstractIncomingMessage) -> None:
+        """Register a delivery as unsettled as soon as it is received"""
+        self._unsettled[message.delivery_tag] = message
+        self.stats.in_flight = len(self._unsettled)
+
+    def submit(
+        self,
+        message: AbstractIncomingMessage,
+        notification: Optional[NotificationCreate],
+        event_key: Optional[str] = None
+    ) -> None:
+        """Queue a handled event; events that produce no notification are only acked"""
+        digest_key = digest_service.digest_key(notification) if notification is not None else None
+        entry = (message, notification, event_key, None)
+        if digest_key is not None:
+            self._hold(digest_key, entry)
+        else:
+            self._enqueue([entry])
+
+    def _enqueue(self, entries: List[BatchEntry]) -> None:
+        self._buffer.extend(entries)
+
+        if len(self._buffer) >= self.batch_size:
+            self._start_flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.linger, self._start_flush)
+
+    def _hold(self, key: DigestKey, entry: BatchEntry) -> None:
+        """Add an event to its digest, starting the digest's window with its first event"""
+        group = self._held.setdefault(key, [])
+        group.append(entry)
+        self.stats.held += 1
+
+        if len(group) == 1:
+            self._held_handles[key] = asyncio.get_running_loop().call_later(
+                digest_service.window(key), self._release, key
+            )
+        if len(group) >= settings.EVENT_DIGEST_MAX_ITEMS:
+            self._release(key)
+        elif self.stats.prefetch and self.stats.held * 2 >= self.stats.prefetch:
+            # Held deliveries use up the prefetch window; past half of it,
+            # end every window early rather than stall the queue
+            for held_key in list(self._held):
+                self._release(held_key)
+
+    def _release(self, key: DigestKey) -> None:
+        """End a digest's window and queue its events for the next flush"""
+        handle = self._held_handles.pop(key, None)
+        if handle is not None:
+            handle.cancel()
+        group = self._held.pop(key, None)
+        if group:
+            self.stats.held -= len(group)
+            # Windows of the same digest key can land in one batch; each stays its own digest
+            window_id = next(self._window_ids)
+            self._enqueue([(message, notification, event_key, window_id) for message, notification, event_key, _ in group])
+
+    async def reject(self, message: AbstractIncomingMessage) -> None:
+        """Reject a single delivery that could not be handled"""
+        try:
+            await message.reject(requeue=False)
+        except Exception as e:
+            logger.error(f"Failed to reject message on {self.queue_name}: {e}")
+        self._settle([message], failed=True)
+
+    def _start_flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._flush(batch))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush(self, batch: List[BatchEntry]) -> None:
+        async with self._flush_semaphore:
+            started = perf_counter()
+            messages = [message for message, _, _, _ in batch]
+            processed: List[str] = []
+            claimed: List[str] = []
+
+            try:
+                notifications, processed, claimed, duplicates, coalesced = await self._prepare(batch)
+                await notification_service.create_notifications(notifications, processed_events=processed)
+            except Exception as e:
+                logger.error(f"Failed to persist batch of {len(batch)} events from {self.queue_name}: {e}")
+                await dedup_service.release(claimed)
+                for message in messages:
+                    await self.reject(message)
+                self._record_flush("error", len(batch), started)
+                return
+            finally:
+                dedup_service.finish(processed + claimed)
+
+            if duplicates:
+                self.stats.duplicates += duplicates
+                logger.info(f"Skipped {duplicates} already processed events from {self.queue_name}")
+            if coalesced:
+                self.stats.coalesced += coalesced
+            await self._ack(messages)
+            self._record_flush("ok", len(batch), started)
+            logger.info(f"Processed batch of {len(batch)} events from {self.queue_name}")
+
+    async def _prepare(self, batch: List[BatchEntry]):
+        """Turn a batch into notifications to write, markers to write with them,
+        markers already claimed, the number of duplicates skipped and the
+        number of notifications merged into digests"""
+        entries = [entry for entry in batch if entry[1] is not None]
+        keyed = [event_key for _, _, event_key, _ in entries if event_key]
+        verdicts = iter(await dedup_service.check(keyed)) if keyed else iter(())
+
+        notifications: List[NotificationCreate] = []
+        digests: Dict[int, List[NotificationCreate]] = {}
+        processed: List[str] = []
+        claimed: List[str] = []
+        duplicates = 0
+        for _, notification, event_key, window_id in entries:
+            verdict = next(verdicts) if event_key else None
+            if verdict == DUPLICATE:
+                duplicates += 1
+                continue
+            if window_id is None:
+                notifications.append(notification)
+            else:
+                digests.setdefault(window_id, []).append(notification)
+            if verdict == NEW:
+                processed.append(event_key)
+            elif verdict == CLAIMED:
+                claimed.append(event_key)
+
+        coalesced = 0
+        for group in digests.values():
+            merged = digest_service.coalesce(group)
+            coalesced += len(group) - len(merged)
+            notifications.extend(merged)
+        return notifications, processed, claimed, duplicates, coalesced
+
+    def _record_flush(self, outcome: str, size: int, started: float) -> None:
+        EVENT_BATCH_DURATION.labels(self.queue_name).observe(perf_counter() - started)
+        EVENT_BATCHES.labels(self.queue_name, outcome).inc()
+        EVENT_BATCH_EVENTS.labels(self.queue_name, outcome).inc(size)
+
+    async def _ack(self, messages: List[AbstractIncomingMessage]) -> None:
+        """Ack a persisted batch, with a single multiple=True ack when possible"""
+        tags = {message.delivery_tag for message in messages}
+        last = max(messages, key=lambda message: message.delivery_tag)
+        covers_all_older = all(
+            tag in tags
+            for tag, message in self._unsettled.items()
+            if tag <= last.delivery_tag
+        )
+
+        try:
+            if covers_all_older:
+                await last.ack(multiple=True)
+            else:
+                for message in messages:
+                    await message.ack()
+        except Exception as e:
+            # The channel went away; the broker will redeliver these messages
+            logger.error(f"Failed to ack batch on {self.queue_name}: {e}")
+
+        self._settle(messages, failed=False)
+
+    def _settle(self, messages: List[AbstractIncomingMessage], failed: bool) -> None:
+        for message in messages:
+            # Tags restart on a recovered channel, so only drop our own entry
+            if self._unsettled.get(message.delivery_tag) is message:
+                del self._unsettled[message.delivery_tag]
+        if failed:
+            self.stats.failed += len(messages)
+        else:
+            self.stats.completed += len(messages)
+        self.stats.in_flight = len(self._unsettled)
+
+    def reset(self) -> None:
+        """Forget deliveries from a channel that was lost; the broker redelivers them"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._buffer = []
+        for handle in self._held_handles.values():
+            handle.cancel()
+        self._held = {}
+        self._held_handles = {}
+        self._unsettled = {}
+        self.stats.in_flight = 0
+        self.stats.held = 0
+
+    async def drain(self) -> None:
+        """Flush buffered and held events and wait for in-progress flushes"""
+        for key in list(self._held):
+            self._release(key)
+        self._start_flush()
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
@@ -0,0 +1,196 @@
+from datetime import datetime
+from typing import Iterable
+from loguru import logger
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Gauge, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from app.core.config import settings
+from app.core.database import redis_manager
+from app.services.email_service import email_service
+from app.services.event_service import event_service
+from app.services.notification_service import notification_service
+from app.services.scheduler_service import scheduler_service
+from app.services.stream_service import stream_service
+from app.utils.auth import token_cache
+
+
+# Refreshed from Redis on every scrape
+BACKLOG = Gauge(
+    "notification_backlog",
+    "Items waiting in Redis work sets (scheduled, scheduled_processing, email_outbox, email_processing, email_dead_letter)",
+    ["queue"]
+)
+SCHEDULER_LAG = Gauge(
+    "notification_scheduler_lag_seconds",
+    "How overdue the oldest scheduled notification is"
+)
+# Refreshed from RabbitMQ on every scrape
+BROKER_QUEUE_DEPTH = Gauge(
+    "notification_broker_queue_depth",
+    "Messages ready in each RabbitMQ queue, not yet delivered to a consumer",
+    ["queue"]
+)
+
+
+class ServiceStateCollector(Collector):
+    """Reads counters and gauges that the services already keep, at scrape time.
+
+    Nothing here runs on the hot path: consumer, pool, worker, stream and
+    token cache state are read from the service objects when ``/metrics`` is
+    scraped.
+    """
+
+    def collect(self) -> Iterable:
+        yield from self._consumer_metrics()
+        yield from self._pool_metrics()
+        yield from self._worker_metrics()
+
+    def _consumer_metrics(self):
+        in_flight = GaugeMetricFamily(
+            "notification_consumer_in_flight", "Unsettled deliveries per queue", labels=["queue"]
+        )
+        waiting = GaugeMetricFamily(
+            "notification_consumer_waiting", "Deliveries waiting for a handler slot per queue", labels=["queue"]
+        )
+        buffered = GaugeMetricFamily(
+            "notification_consumer_buffered", "Handled events waiting for the next batch write per queue", labels=["queue"]
+        )
+        concurrency = GaugeMetricFamily(
+            "notification_consumer_concurrency", "Handler slots per queue", labels=["queue"]
+        )
+        settled = CounterMetricFamily(
+            "notification_consumer_settled", "Deliveries acked (completed) or rejected (failed) per queue",
+            labels=["queue", "outcome"]
+        )
+        duplicates = CounterMetricFamily(
+            "notification_consumer_duplicates", "Deliveries acked without a write because their event was already processed",
+            labels=["queue"]
+        )
+        held = GaugeMetricFamily(
+            "notification_consumer_held", "Events held for a digest window per queue", labels=["queue"]
+        )
+        coalesced = CounterMetricFamily(
+            "notification_consumer_coalesced", "Notifications merged into digests instead of written on their own",
+            labels=["queue"]
+        )
+        for queue_name, stats in event_service.stats.items():
+            in_flight.add_metric([queue_name], stats.in_flight)
+            waiting.add_metric([queue_name], stats.waiting)
+            buffered.add_metric([queue_name], event_service.batchers[queue_name].buffered)
+            concurrency.add_metric([queue_name], stats.concurrency)
+            settled.add_metric([queue_name, "completed"], stats.completed)
+            settled.add_metric([queue_name, "failed"], stats.failed)
+            duplicates.add_metric([queue_name], stats.duplicates)
+            held.add_metric([queue_name], stats.held)
+            coalesced.add_metric([queue_name], stats.coalesced)
+        yield from (in_flight, waiting, buffered, concurrency, settled, duplicates, held, coalesced)
+
+    def _pool_metrics(self):
+        redis_pool = GaugeMetricFamily(
+            "notification_redis_pool_connections", "Redis pool connections by state (in_use, idle, max)",
+            labels=["state"]
+        )
+        pool = redis_manager.pool
+        if pool is not None:
+            redis_pool.add_metric(["in_use"], len(pool._in_use_connections))
+            redis_pool.add_metric(["idle"], len(pool._available_connections))
+            redis_pool.add_metric(["max"], pool.max_connections)
+        yield redis_pool
+
+        smtp_pool = GaugeMetricFamily(
+            "notification_smtp_pool_connections", "SMTP pool slots by state (busy, max)", labels=["state"]
+        )
+        if email_service.pool is not None:
+            smtp_pool.add_metric(["busy"], email_service.pool.in_use)
+            smtp_pool.add_metric(["max"], email_service.pool.size)
+        yield smtp_pool
+
+        streams = GaugeMetricFamily(
+            "notification_stream_connections", "Open notification streams by state (open, max)", labels=["state"]
+        )
+        streams.add_metric(["open"], stream_service.connection_count)
+        streams.add_metric(["max"], settings.STREAM_MAX_CONNECTIONS)
+        yield streams
+
+        token_stats = token_cache.stats()
+        yield GaugeMetricFamily(
+            "notification_token_cache_entries", "Verified tokens cached", value=token_stats["size"]
+        )
+        lookups = CounterMetricFamily(
+            "notification_token_cache_lookups", "Verified-token cache lookups by result", labels=["result"]
+        )
+        lookups.add_metric(["hit"], token_stats["hits"])
+        lookups.add_metric(["miss"], token_stats["misses"])
+        yield lookups
+
+    def _worker_metrics(self):
+        yield CounterMetricFamily(
+            "notification_scheduler_fired", "Scheduled notifications fired by this process",
+            value=scheduler_service.fired_total
+        )
+        deliveries = CounterMetricFamily(
+            "notification_email_deliveries", "Email delivery attempts by this process by outcome",
+            labels=["outcome"]
+        )
+        deliveries.add_metric(["sent"], email_service.sent_total)
+        deliveries.add_metric(["failed"], email_service.failed_total)
+        yield deliveries
+        yield CounterMetricFamily(
+            "notification_stream_events", "Stream events received from pub/sub by this process",
+            value=stream_service.events_received
+        )
+        yield CounterMetricFamily(
+            "notification_stream_resyncs", "Resync events sent to streams that fell behind",
+            value=stream_service.resyncs
+        )
+
+
+class MetricsService:
+    """Renders the Prometheus exposition for ``/metrics``"""
+
+    content_type = CONTENT_TYPE_LATEST
+
+    def __init__(self):
+        REGISTRY.register(ServiceStateCollector())
+
+    async def render(self) -> bytes:
+        """Refresh the Redis- and broker-backed gauges, then render every registered metric"""
+        try:
+            await self._refresh_backlog()
+        except Exception as e:
+            logger.warning(f"Failed to refresh backlog metrics: {e}")
+        try:
+            await self._refresh_broker_depth()
+        except Exception as e:
+            logger.warning(f"Failed to refresh broker queue depth: {e}")
+        return generate_latest(REGISTRY)
+
+    async def _refresh_backlog(self):
+        redis_client = await redis_manager.get_client()
+        if not redis_client:
+            return
+
+        backlog_keys = {
+            "scheduled": notification_service.scheduled_key,
+            "scheduled_processing": notification_service.scheduled_processing_key,
+            "email_outbox": notification_service.email_outbox_key,
+            "email_processing": notification_service.email_processing_key,
+            "email_dead_letter": notification_service.email_dead_letter_key,
+        }
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key in backlog_keys.values():
+                pipe.zcard(key)
+            pipe.zrange(notification_service.scheduled_key, 0, 0, withscores=True)
+            *sizes, oldest = await pipe.execute()
+        for queue, size in zip(backlog_keys, sizes):
+            BACKLOG.labels(queue).set(size)
+        SCHEDULER_LAG.set(max(datetime.utcnow().timestamp() - oldest[0][1], 0.0) if oldest else 0.0)
+
+    async def _refresh_broker_depth(self):
+        for queue, depth in (await event_service.queue_depths()).items():
+            BROKER_QUEUE_DEPTH.labels(queue).set(depth)
+
+
+# Global metrics service instance
+metrics_service = MetricsService()
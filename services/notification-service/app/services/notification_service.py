@@ -1,25 +1,85 @@
+import base64
 import json
+import random
 import uuid
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from datetime import datetime, timezone
+from typing import List, Optional, Dict, Any, Sequence, Tuple
 from loguru import logger
-import asyncio
+from redis.exceptions import WatchError
 
-from app.core.database import redis_manager, async_redis_operation
+from app.core.config import settings
+from app.core.database import redis_manager
+from app.core.metrics import NOTIFICATIONS_CREATED
+from app.services.dedup_service import dedup_service
+from app.services.template_service import template_service
+from app.utils import record_codec
 from app.models.notification import (
     NotificationCreate,
     NotificationResponse,
     NotificationUpdate,
     NotificationStatus,
-    NotificationType,
-    NOTIFICATION_TEMPLATES
+    NotificationType
 )
 
 
+# Recompute a user's unread counter from the user index and the read index
+RECONCILE_UNREAD_SCRIPT = """
+local unread = redis.call('ZCARD', KEYS[1]) - redis.call('ZCARD', KEYS[2])
+redis.call('SET', KEYS[3], unread)
+return unread
+"""
+
+
+# Drop index entries whose notification hash has expired, adjusting the unread
+# counter. KEYS: user index, unread counter, read index, ARGV[1] other status
+# indexes, then one hash key per ID in ARGV[2..]
+PRUNE_EXPIRED_SCRIPT = """
+local other_statuses = tonumber(ARGV[1])
+local first_hash = 4 + other_statuses
+local pruned = 0
+local unread = 0
+for i = 2, #ARGV do
+    local notification_id = ARGV[i]
+    if redis.call('EXISTS', KEYS[first_hash + i - 2]) == 0 then
+        if redis.call('ZREM', KEYS[1], notification_id) == 1 then
+            pruned = pruned + 1
+            if redis.call('ZREM', KEYS[3], notification_id) == 0 then
+                unread = unread + 1
+            end
+            for s = 4, 3 + other_statuses do
+                redis.call('ZREM', KEYS[s], notification_id)
+            end
+        end
+    end
+end
+if unread > 0 then
+    redis.call('DECRBY', KEYS[2], unread)
+end
+return pruned
+"""
+
+
+# Apply a change to a user's unread counter and publish the new value to the
+# user's stream channel as an SSE frame. KEYS: counter; ARGV: delta, channel
+UNREAD_CHANGE_SCRIPT = """
+local unread = redis.call('INCRBY', KEYS[1], ARGV[1])
+redis.call('PUBLISH', ARGV[2], 'event: unread_count\\ndata: {"unread_count":' .. math.max(unread, 0) .. '}\\n\\n')
+return unread
+"""
+
+
 class NotificationService:
     def __init__(self):
         self.redis_prefix = "notification:"
         self.user_notifications_prefix = "user_notifications:"
+        self.user_status_prefix = "user_notifications_by_status:"
+        self.unread_count_prefix = "user_unread_count:"
+        self.scheduled_key = "scheduled_notifications"
+        self.scheduled_processing_key = "scheduled_notifications:processing"
+        self.email_outbox_key = "email_outbox"
+        self.email_processing_key = "email_outbox:processing"
+        self.email_dead_letter_key = "email_dead_letter"
+        self.stream_channel_prefix = "notification_stream:"
 
     async def create_notification(self, notification_data: NotificationCreate) -> NotificationResponse:
         """Create a new notification"""
@@ -28,60 +88,228 @@ class NotificationService:
             if not redis_client:
                 raise Exception("Redis connection not available")
 
-            notification_id = str(uuid.uuid4())
-            now = datetime.utcnow()
-
-            notification = NotificationResponse(
-                id=notification_id,
-                type=notification_data.type,
-                recipient_id=notification_data.recipient_id,
-                recipient_email=notification_data.recipient_email,
-                title=notification_data.title,
-                message=notification_data.message,
-                priority=notification_data.priority,
-                status=NotificationStatus.PENDING,
-                data=notification_data.data,
-                created_at=now,
-                updated_at=now,
-                scheduled_at=notification_data.scheduled_at
-            )
-
-            # Store notification using sync operations wrapped in async
-            notification_key = f"{self.redis_prefix}{notification_id}"
-            
-            # Use executor to run sync Redis operations
-            loop = asyncio.get_event_loop()
-            
-            # Prepare the data for hset
-            notification_hash = {
-                "id": notification.id,
-                "type": notification.type.value,
-                "recipient_id": notification.recipient_id,
-                "recipient_email": notification.recipient_email or "",
-                "title": notification.title,
-                "message": notification.message,
-                "priority": notification.priority.value,
-                "status": notification.status.value,
-                "data": json.dumps(notification.data) if notification.data else "{}",
-                "created_at": notification.created_at.isoformat(),
-                "updated_at": notification.updated_at.isoformat(),
-                "scheduled_at": notification.scheduled_at.isoformat() if notification.scheduled_at else "",
-            }
-            
-            # Use hset with mapping parameter
-            await loop.run_in_executor(None, lambda: redis_client.hset(notification_key, mapping=notification_hash))
+            notification = self._new_notification(notification_data, datetime.utcnow())
 
-            # Add to user's notification list
-            user_key = f"{self.user_notifications_prefix}{notification.recipient_id}"
-            await loop.run_in_executor(None, redis_client.zadd, user_key, {notification_id: now.timestamp()})
+            # All writes for a create go out as one MULTI/EXEC round trip, so a
+            # crash can never leave a hash that no index points to
+            async with redis_client.pipeline(transaction=True) as pipe:
+                self._queue_create(pipe, notification)
+                await pipe.execute()
 
-            logger.info(f"Created notification {notification_id} for user {notification.recipient_id}")
+            NOTIFICATIONS_CREATED.labels(notification.type.value).inc()
+            logger.info(f"Created notification {notification.id} for user {notification.recipient_id}")
             return notification
 
         except Exception as e:
             logger.error(f"Error creating notification: {e}")
             raise
 
+    async def create_notifications(
+        self,
+        notifications_data: List[NotificationCreate],
+        processed_events: Sequence[str] = ()
+    ) -> List[NotificationResponse]:
+        """Create several notifications with a single pipelined MULTI/EXEC round trip.
+
+        ``processed_events`` are deduplication markers of the events the
+        notifications come from, written in the same transaction.
+        """
+        if not notifications_data:
+            return []
+
+        try:
+            redis_client = await redis_manager.get_client()
+            if not redis_client:
+                raise Exception("Redis connection not available")
+
+            now = datetime.utcnow()
+            notifications = [self._new_notification(data, now) for data in notifications_data]
+
+            async with redis_client.pipeline(transaction=True) as pipe:
+                for notification in notifications:
+                    self._queue_create(pipe, notification)
+                dedup_service.queue_mark(pipe, processed_events)
+                await pipe.execute()
+
+            created_by_type: Dict[str, int] = {}
+            for notification in notifications:
+                created_by_type[notification.type.value] = created_by_type.get(notification.type.value, 0) + 1
+            for notification_type, count in created_by_type.items():
+                NOTIFICATIONS_CREATED.labels(notification_type).inc(count)
+            logger.info(f"Created {len(notifications)} notifications in one batch")
+            return notifications
+
+        except Exception as e:
+            logger.error(f"Error creating notification batch: {e}")
+            raise
+
+    def _new_notification(self, notification_data: NotificationCreate, now: datetime) -> NotificationResponse:
+        """Build a new notification from creation data: scheduled if due later, otherwise pending"""
+        scheduled_at = notification_data.scheduled_at
+        if scheduled_at and scheduled_at.tzinfo:
+            scheduled_at = scheduled_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+        return NotificationResponse(
+            id=str(uuid.uuid4()),
+            type=notification_data.type,
+            recipient_id=notification_data.recipient_id,
+            recipient_email=notification_data.recipient_email,
+            title=notification_data.title,
+            message=notification_data.message,
+            priority=notification_data.priority,
+            status=NotificationStatus.SCHEDULED if scheduled_at and scheduled_at > now else NotificationStatus.PENDING,
+            data=notification_data.data,
+            created_at=now,
+            updated_at=now,
+            scheduled_at=scheduled_at
+        )
+
+    def _build_notification_hash(self, notification: NotificationResponse) -> Dict[str, str]:
+        """Build the Redis hash representation of a notification"""
+        return {
+            "id": notification.id,
+            "type": notification.type.value,
+            "recipient_id": notification.recipient_id,
+            "recipient_email": notification.recipient_email or "",
+            "title": notification.title,
+            "message": notification.message,
+            "priority": notification.priority.value,
+            "status": notification.status.value,
+            "data": json.dumps(notification.data) if notification.data else "{}",
+            "created_at": notification.created_at.isoformat(),
+            "updated_at": notification.updated_at.isoformat(),
+            "scheduled_at": notification.scheduled_at.isoformat() if notification.scheduled_at else "",
+        }
+
+    def _queue_create(self, pipe, notification: NotificationResponse) -> None:
+        """Queue every write needed to persist a new notification on a pipeline.
+
+        Any index or counter that tracks notifications must be maintained here,
+        so a create always costs a single round trip.
+        """
+        notification_key = f"{self.redis_prefix}{notification.id}"
+        fields = self._build_notification_hash(notification)
+        pipe.hset(notification_key, mapping=self._encode_record(fields))
+
+        # The hash expires on its own, counting retention from when it is delivered
+        retention = self._retention_seconds(notification.type.value, notification.priority.value)
+
+        if notification.status == NotificationStatus.SCHEDULED:
+            # Kept out of the user's indexes until the scheduler fires it
+            pipe.zadd(self.scheduled_key, {notification.id: notification.scheduled_at.timestamp()})
+            if retention:
+                delay = (notification.scheduled_at - notification.created_at).total_seconds()
+                pipe.expire(notification_key, retention + int(delay))
+            return
+
+        if retention:
+            pipe.expire(notification_key, retention)
+        self._queue_index_entry(pipe, fields, self._index_score(notification.created_at, notification.scheduled_at))
+        self._queue_outbox(pipe, notification.id, notification.type.value)
+
+    def _queue_outbox(self, pipe, notification_id: str, notification_type: str) -> None:
+        """Queue a newly pending email notification for the delivery worker"""
+        if notification_type == NotificationType.EMAIL.value and settings.EMAIL_DELIVERY_ENABLED:
+            pipe.zadd(self.email_outbox_key, {notification_id: datetime.utcnow().timestamp()})
+
+    def _queue_index_entry(self, pipe, fields: Dict[str, str], score: float) -> None:
+        """Queue adding a delivered notification to the user's indexes and unread
+        counter, and pushing it to the user's open streams"""
+        user_id = fields["recipient_id"]
+        status = fields["status"]
+        user_key = f"{self.user_notifications_prefix}{user_id}"
+        pipe.zadd(user_key, {fields["id"]: score})
+        pipe.zadd(self._status_key(user_id, status), {fields["id"]: score})
+        self._queue_stream_event(pipe, user_id, "notification", self._record_to_dict(fields))
+        if self._counts_as_unread(status):
+            self._queue_unread_change(pipe, user_id, 1)
+
+        # The per-user keys live as long as the longest retention past the
+        # newest notification
+        index_retention = self._index_retention_seconds()
+        if index_retention:
+            pipe.expire(user_key, index_retention)
+            pipe.expire(self._status_key(user_id, status), index_retention)
+            pipe.expire(self._unread_key(user_id), index_retention)
+
+    def _queue_stream_event(self, pipe, user_id: str, event: str, data: Dict[str, Any]) -> None:
+        """Queue publishing an event to the user's stream channel as a ready-to-send SSE frame"""
+        frame = f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+        pipe.publish(f"{self.stream_channel_prefix}{user_id}", frame)
+
+    def _queue_unread_change(self, pipe, user_id: str, delta: int) -> None:
+        """Queue a change to the user's unread counter, publishing the new count to their streams"""
+        pipe.eval(
+            UNREAD_CHANGE_SCRIPT,
+            1,
+            self._unread_key(user_id),
+            delta,
+            f"{self.stream_channel_prefix}{user_id}"
+        )
+
+    def _index_score(self, created_at: datetime, scheduled_at: Optional[datetime]) -> float:
+        """Index score of a notification: when it was delivered to the user"""
+        if scheduled_at and scheduled_at > created_at:
+            return scheduled_at.timestamp()
+        return created_at.timestamp()
+
+    def _counts_as_unread(self, status: str) -> bool:
+        """Whether a notification in this status contributes to the unread counter"""
+        return status not in (NotificationStatus.READ.value, NotificationStatus.SCHEDULED.value)
+
+    def _retention_seconds(self, notification_type: str, priority: str) -> int:
+        """Expiry for a notification hash; 0 means it is kept until cleaned up"""
+        days = settings.NOTIFICATION_RETENTION_DAYS_BY_TYPE.get(
+            notification_type,
+            settings.NOTIFICATION_RETENTION_DAYS_BY_PRIORITY.get(priority, settings.NOTIFICATION_RETENTION_DAYS)
+        )
+        return max(int(days * 86400), 0)
+
+    def _index_retention_seconds(self) -> int:
+        """Expiry for per-user index keys: the longest retention, or 0 if any notification is kept"""
+        retentions = [
+            settings.NOTIFICATION_RETENTION_DAYS,
+            *settings.NOTIFICATION_RETENTION_DAYS_BY_TYPE.values(),
+            *settings.NOTIFICATION_RETENTION_DAYS_BY_PRIORITY.values()
+        ]
+        if min(retentions) <= 0:
+            return 0
+        return int(max(retentions) * 86400)
+
+    def _shortest_retention_seconds(self) -> int:
+        """Age past which a notification may have expired, or 0 if none ever does"""
+        retentions = [
+            days for days in (
+                settings.NOTIFICATION_RETENTION_DAYS,
+                *settings.NOTIFICATION_RETENTION_DAYS_BY_TYPE.values(),
+                *settings.NOTIFICATION_RETENTION_DAYS_BY_PRIORITY.values()
+            )
+            if days > 0
+        ]
+        return int(min(retentions) * 86400) if retentions else 0
+
+    def _encode_record(self, fields: Dict[str, str]) -> Dict[str, str]:
+        """Encode notification fields in the configured storage format"""
+        return record_codec.encode(fields, settings.NOTIFICATION_STORAGE_FORMAT)
+
+    def _queue_drop_stale_fields(self, pipe, notification_key: str, stored: Dict[str, str], record: Dict[str, str]) -> None:
+        """Remove fields of the previous storage format after a record was rewritten.
+
+        Runs after the HSET so the key is never momentarily empty, which keeps
+        any TTL on it.
+        """
+        stale_fields = [field for field in stored if field not in record]
+        if stale_fields:
+            pipe.hdel(notification_key, *stale_fields)
+
+    def _status_key(self, user_id: str, status: str) -> str:
+        """Key of the per-user sorted set indexing notifications with a given status"""
+        return f"{self.user_status_prefix}{user_id}:{status}"
+
+    def _unread_key(self, user_id: str) -> str:
+        """Key of the per-user unread notification counter"""
+        return f"{self.unread_count_prefix}{user_id}"
+
     async def get_notification(self, notification_id: str) -> Optional[NotificationResponse]:
         """Get notification by ID"""
         try:
@@ -90,8 +318,9 @@ class NotificationService:
                 return None
 
             notification_key = f"{self.redis_prefix}{notification_id}"
-            loop = asyncio.get_event_loop()
-            notification_data = await loop.run_in_executor(None, redis_client.hgetall, notification_key)
+            notification_data = record_codec.decode(
+                notification_id, await redis_client.hgetall(notification_key)
+            )
 
             if not notification_data:
                 return None
@@ -102,53 +331,178 @@ class NotificationService:
             logger.error(f"Error getting notification {notification_id}: {e}")
             return None
 
+    async def get_notifications(self, notification_ids: List[str], raw: bool = False) -> List[Any]:
+        """Get several notifications by ID in a single round trip, preserving order.
+
+        With ``raw`` the notifications are JSON-ready dicts (see ``_record_to_dict``).
+        Only notifications whose hash is missing are left out; Redis errors are
+        raised so callers can tell a missing notification from a failed read.
+        """
+        try:
+            redis_client = await redis_manager.get_client()
+            if not redis_client:
+                raise Exception("Redis connection not available")
+
+            records = await self._fetch_notification_records(redis_client, notification_ids)
+            build = self._record_to_dict if raw else self._parse_notification_data
+            return [build(record) for record in records if record]
+
+        except Exception as e:
+            logger.error(f"Error getting notifications {notification_ids}: {e}")
+            raise
+
+    async def _fetch_notification_records(self, redis_client, notification_ids: List[str]) -> List[Dict[str, str]]:
+        """Fetch notification records for a list of IDs with one pipelined HGETALL batch.
+
+        Records are decoded to field dicts whatever their storage format. The
+        result is aligned with ``notification_ids``; missing notifications
+        come back as empty dicts.
+        """
+        if not notification_ids:
+            return []
+
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for notification_id in notification_ids:
+                pipe.hgetall(f"{self.redis_prefix}{notification_id}")
+            records = await pipe.execute()
+
+        return [
+            record_codec.decode(notification_id, record) or {}
+            for notification_id, record in zip(notification_ids, records)
+        ]
+
     async def get_user_notifications(
         self,
         user_id: str,
         page: int = 1,
         limit: int = 20,
-        status_filter: Optional[NotificationStatus] = None
+        status_filter: Optional[NotificationStatus] = None,
+        raw: bool = False,
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Get notifications for a specific user"""
+        """Get notifications for a specific user.
+
+        Pages are addressed either by ``page`` offset or by an opaque
+        ``cursor`` taken from a previous response's ``next_cursor``. Cursor
+        pages resume strictly after the last item seen, so they cost the same
+        at any depth and do not shift when new notifications arrive. Raises
+        ValueError for a malformed cursor, and Redis errors rather than
+        returning an empty page.
+
+        With ``raw`` the notifications are JSON-ready dicts (see ``_record_to_dict``).
+        """
+        after = self._decode_cursor(cursor) if cursor else None
+
         try:
             redis_client = await redis_manager.get_client()
             if not redis_client:
-                return {"notifications": [], "total": 0, "page": page, "limit": limit}
+                raise Exception("Redis connection not available")
 
-            user_key = f"{self.user_notifications_prefix}{user_id}"
-            loop = asyncio.get_event_loop()
-            
-            # Get total count
-            total = await loop.run_in_executor(None, redis_client.zcard, user_key)
-            
-            # Calculate pagination
-            start = (page - 1) * limit
-            end = start + limit - 1
+            # Status-filtered listings read straight from the per-status index
+            if status_filter:
+                index_key = self._status_key(user_id, status_filter.value)
+            else:
+                index_key = f"{self.user_notifications_prefix}{user_id}"
             
-            # Get notification IDs (newest first)
-            notification_ids = await loop.run_in_executor(None, redis_client.zrevrange, user_key, start, end)
+            if after:
+                total, entries, has_next = await self._fetch_page_after(redis_client, index_key, after, limit)
+                page = None
+                has_prev = True
+            else:
+                # Calculate pagination
+                start = (page - 1) * limit
+                end = start + limit - 1
+                
+                # Get total count and notification IDs (newest first) in one round trip
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    pipe.zcard(index_key)
+                    pipe.zrevrange(index_key, start, end, withscores=True)
+                    total, entries = await pipe.execute()
+                has_next = end < total - 1
+                has_prev = page > 1
             
-            notifications = []
-            for notification_id in notification_ids:
-                notification = await self.get_notification(notification_id)
-                if notification:
-                    # Apply status filter
-                    if status_filter and notification.status != status_filter:
-                        continue
-                    notifications.append(notification)
+            notification_ids = [notification_id for notification_id, _ in entries]
+            records = await self._fetch_notification_records(redis_client, notification_ids)
+            expired_ids = [
+                notification_id for notification_id, record in zip(notification_ids, records) if not record
+            ]
+            if expired_ids:
+                total -= await self._prune_expired(redis_client, user_id, expired_ids)
+
+            build = self._record_to_dict if raw else self._parse_notification_data
+            notifications = [build(record) for record in records if record]
 
             return {
                 "notifications": notifications,
                 "total": total,
                 "page": page,
                 "limit": limit,
-                "has_next": end < total - 1,
-                "has_prev": page > 1
+                "has_next": has_next,
+                "has_prev": has_prev,
+                "next_cursor": self._encode_cursor(*entries[-1][::-1]) if has_next and entries else None
             }
 
         except Exception as e:
             logger.error(f"Error getting user notifications for {user_id}: {e}")
-            return {"notifications": [], "total": 0, "page": page, "limit": limit}
+            raise
+
+    async def _prune_expired(self, redis_client, user_id: str, notification_ids: List[str]) -> int:
+        """Remove index entries whose hashes have expired; returns how many were pruned.
+
+        The existence check, index removals and unread adjustment run as one
+        script, so a concurrent reader pruning the same IDs cannot double count.
+        """
+        other_status_keys = [
+            self._status_key(user_id, status.value)
+            for status in NotificationStatus
+            if status != NotificationStatus.READ
+        ]
+        prune = redis_client.register_script(PRUNE_EXPIRED_SCRIPT)
+        pruned = await prune(
+            keys=[
+                f"{self.user_notifications_prefix}{user_id}",
+                self._unread_key(user_id),
+                self._status_key(user_id, NotificationStatus.READ.value),
+                *other_status_keys,
+                *[f"{self.redis_prefix}{notification_id}" for notification_id in notification_ids]
+            ],
+            args=[len(other_status_keys), *notification_ids]
+        )
+        if pruned:
+            logger.info(f"Pruned {pruned} expired notifications from the indexes of user {user_id}")
+        return pruned
+
+    async def _fetch_page_after(self, redis_client, index_key: str, after: Tuple[float, str], limit: int):
+        """Fetch up to ``limit`` index entries ordered after a (score, id) position.
+
+        Index order is score descending, then member descending for equal
+        scores (as ZREVRANGE returns them). Entries sharing the cursor's score
+        are filtered by ID; everything older comes from an exclusive score
+        bound. Total, entries and has_next come back in one round trip.
+        """
+        score, notification_id = after
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.zcard(index_key)
+            # Ties are notifications written in the same batch, so this stays small
+            pipe.zrevrangebyscore(index_key, score, score, withscores=True)
+            pipe.zrevrangebyscore(index_key, f"({score!r}", "-inf", start=0, num=limit + 1, withscores=True)
+            total, ties, older = await pipe.execute()
+
+        entries = [entry for entry in ties if entry[0] < notification_id] + older
+        return total, entries[:limit], len(entries) > limit
+
+    def _encode_cursor(self, score: float, notification_id: str) -> str:
+        """Opaque cursor for the position of an index entry"""
+        return base64.urlsafe_b64encode(f"{score!r}:{notification_id}".encode()).decode().rstrip("=")
+
+    def _decode_cursor(self, cursor: str) -> Tuple[float, str]:
+        """Parse a cursor from ``_encode_cursor``; raises ValueError if malformed"""
+        try:
+            decoded = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            score, notification_id = decoded.split(":", 1)
+            return float(score), notification_id
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ValueError("Invalid cursor") from e
 
     async def update_notification(
         self,
@@ -162,27 +516,46 @@ class NotificationService:
                 return None
 
             notification_key = f"{self.redis_prefix}{notification_id}"
-            loop = asyncio.get_event_loop()
-            notification_data = await loop.run_in_executor(None, redis_client.hgetall, notification_key)
 
-            if not notification_data:
-                return None
+            # Optimistic transaction: the status indexes must move together with
+            # the hash, so retry if the notification changes under us
+            async with redis_client.pipeline(transaction=True) as pipe:
+                while True:
+                    try:
+                        await pipe.watch(notification_key)
+                        stored = await pipe.hgetall(notification_key)
+                        notification_data = record_codec.decode(notification_id, stored)
 
-            # Update fields
-            now = datetime.utcnow()
-            if update_data.status:
-                notification_data["status"] = update_data.status.value
-                if update_data.status == NotificationStatus.SENT:
-                    notification_data["sent_at"] = now.isoformat()
-            
-            if update_data.read_at:
-                notification_data["read_at"] = update_data.read_at.isoformat()
-                notification_data["status"] = NotificationStatus.READ.value
+                        if not notification_data:
+                            return None
 
-            notification_data["updated_at"] = now.isoformat()
+                        previous_status = notification_data["status"]
 
-            # Save updated notification
-            await loop.run_in_executor(None, lambda: redis_client.hset(notification_key, mapping=notification_data))
+                        # Update fields
+                        now = datetime.utcnow()
+                        if update_data.status:
+                            notification_data["status"] = update_data.status.value
+                            if update_data.status == NotificationStatus.SENT:
+                                notification_data["sent_at"] = now.isoformat()
+                        
+                        if update_data.read_at:
+                            notification_data["read_at"] = update_data.read_at.isoformat()
+                            notification_data["status"] = NotificationStatus.READ.value
+
+                        notification_data["updated_at"] = now.isoformat()
+
+                        # Save updated notification
+                        record = self._encode_record(notification_data)
+
+                        pipe.multi()
+                        pipe.hset(notification_key, mapping=record)
+                        self._queue_drop_stale_fields(pipe, notification_key, stored, record)
+                        if notification_data["status"] != previous_status:
+                            self._queue_status_change(pipe, notification_data, previous_status)
+                        await pipe.execute()
+                        break
+                    except WatchError:
+                        continue
 
             return self._parse_notification_data(notification_data)
 
@@ -190,6 +563,181 @@ class NotificationService:
             logger.error(f"Error updating notification {notification_id}: {e}")
             return None
 
+    async def record_delivery_failure(self, notification_id: str, error: str, permanent: bool = False) -> Optional[str]:
+        """Mark a failed delivery attempt and schedule a retry or dead-letter the notification.
+
+        The attempt count and error are stored on the notification. Until
+        ``MAX_RETRIES`` retries have failed, the notification is re-queued in
+        the email outbox at a future score (exponential backoff from
+        ``RETRY_DELAY`` with jitter); after that, or straight away for a
+        permanent error, it moves to the dead-letter set. Returns "retry" or
+        "dead_letter", or None if the notification no longer exists.
+        """
+        redis_client = await redis_manager.get_client()
+        if not redis_client:
+            raise Exception("Redis connection not available")
+
+        notification_key = f"{self.redis_prefix}{notification_id}"
+        async with redis_client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(notification_key)
+                    stored = await pipe.hgetall(notification_key)
+                    notification_data = record_codec.decode(notification_id, stored)
+                    if not notification_data:
+                        return None
+
+                    previous_status = notification_data["status"]
+                    attempts = int(notification_data.get("attempts") or 0) + 1
+                    now = datetime.utcnow()
+                    notification_data["status"] = NotificationStatus.FAILED.value
+                    notification_data["attempts"] = str(attempts)
+                    notification_data["last_error"] = error[:500]
+                    notification_data["updated_at"] = now.isoformat()
+                    record = self._encode_record(notification_data)
+
+                    pipe.multi()
+                    pipe.hset(notification_key, mapping=record)
+                    self._queue_drop_stale_fields(pipe, notification_key, stored, record)
+                    if previous_status != notification_data["status"]:
+                        self._queue_status_change(pipe, notification_data, previous_status)
+
+                    if permanent or attempts > settings.MAX_RETRIES:
+                        pipe.zadd(self.email_dead_letter_key, {notification_id: now.timestamp()})
+                        outcome = "dead_letter"
+                    else:
+                        retry_at = now.timestamp() + self._retry_delay(attempts)
+                        pipe.zadd(self.email_outbox_key, {notification_id: retry_at})
+                        outcome = "retry"
+                    await pipe.execute()
+                    return outcome
+                except WatchError:
+                    continue
+
+    def _retry_delay(self, attempts: int) -> float:
+        """Backoff before the next attempt: doubles per failure up to RETRY_MAX_DELAY, with equal jitter"""
+        delay = min(settings.RETRY_DELAY * 2 ** (attempts - 1), settings.RETRY_MAX_DELAY)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def get_dead_letters(self, page: int = 1, limit: int = 20) -> Dict[str, Any]:
+        """List dead-lettered notifications, oldest first, as JSON-ready dicts"""
+        redis_client = await redis_manager.get_client()
+        if not redis_client:
+            return {"items": [], "total": 0, "page": page, "limit": limit}
+
+        start = (page - 1) * limit
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.zcard(self.email_dead_letter_key)
+            pipe.zrange(self.email_dead_letter_key, start, start + limit - 1, withscores=True)
+            total, entries = await pipe.execute()
+
+        records = await self._fetch_notification_records(
+            redis_client, [notification_id for notification_id, _ in entries]
+        )
+        items = []
+        for (notification_id, score), record in zip(entries, records):
+            if record:
+                item = self._record_to_dict(record)
+                item["dead_lettered_at"] = datetime.utcfromtimestamp(score).isoformat()
+                items.append(item)
+
+        return {
+            "items": items,
+            "total": total,
+            "page": page,
+            "limit": limit,
+            "has_next": start + limit < total,
+            "has_prev": page > 1
+        }
+
+    async def replay_dead_letters(self, notification_ids: Optional[List[str]] = None, limit: int = 1000) -> Dict[str, int]:
+        """Re-queue dead-lettered notifications for delivery with a fresh attempt count.
+
+        Replays the given IDs, or the oldest ``limit`` entries when none are
+        given, in one WATCHed MULTI/EXEC. IDs not in the dead-letter set are
+        ignored; entries whose notification has expired are dropped.
+        """
+        redis_client = await redis_manager.get_client()
+        if not redis_client:
+            raise Exception("Redis connection not available")
+
+        if notification_ids is None:
+            notification_ids = await redis_client.zrange(self.email_dead_letter_key, 0, limit - 1)
+        if not notification_ids:
+            return {"replayed": 0, "dropped": 0}
+
+        keys = [f"{self.redis_prefix}{notification_id}" for notification_id in notification_ids]
+        async with redis_client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(self.email_dead_letter_key, *keys)
+                    async with redis_client.pipeline(transaction=False) as reader:
+                        reader.zmscore(self.email_dead_letter_key, notification_ids)
+                        for key in keys:
+                            reader.hgetall(key)
+                        scores, *stored_records = await reader.execute()
+
+                    now = datetime.utcnow()
+                    replayed = dropped = 0
+                    pipe.multi()
+                    for notification_id, key, score, stored in zip(notification_ids, keys, scores, stored_records):
+                        if score is None:
+                            continue
+                        pipe.zrem(self.email_dead_letter_key, notification_id)
+                        fields = record_codec.decode(notification_id, stored)
+                        if not fields:
+                            dropped += 1
+                            continue
+
+                        previous_status = fields["status"]
+                        fields["status"] = NotificationStatus.PENDING.value
+                        fields["attempts"] = "0"
+                        fields["last_error"] = ""
+                        fields["updated_at"] = now.isoformat()
+                        record = self._encode_record(fields)
+                        pipe.hset(key, mapping=record)
+                        self._queue_drop_stale_fields(pipe, key, stored, record)
+                        if previous_status != fields["status"]:
+                            self._queue_status_change(pipe, fields, previous_status)
+                        pipe.zadd(self.email_outbox_key, {notification_id: now.timestamp()})
+                        replayed += 1
+                    await pipe.execute()
+                    break
+                except WatchError:
+                    continue
+
+        logger.info(f"Replayed {replayed} dead-lettered notifications ({dropped} expired)")
+        return {"replayed": replayed, "dropped": dropped}
+
+    def _queue_status_change(self, pipe, notification_data: Dict[str, str], previous_status: str) -> None:
+        """Queue the index moves for a notification whose status changed"""
+        user_id = notification_data["recipient_id"]
+        notification_id = notification_data["id"]
+        score = self._index_score(
+            datetime.fromisoformat(notification_data["created_at"]),
+            datetime.fromisoformat(notification_data["scheduled_at"]) if notification_data.get("scheduled_at") else None
+        )
+
+        if previous_status == NotificationStatus.SCHEDULED.value:
+            # Changing a scheduled notification delivers it now
+            pipe.zrem(self.scheduled_key, notification_id)
+            pipe.zrem(self.scheduled_processing_key, notification_id)
+            self._queue_index_entry(pipe, notification_data, score)
+            return
+
+        pipe.zrem(self._status_key(user_id, previous_status), notification_id)
+        pipe.zadd(self._status_key(user_id, notification_data["status"]), {notification_id: score})
+        index_retention = self._index_retention_seconds()
+        if index_retention:
+            pipe.expire(self._status_key(user_id, notification_data["status"]), index_retention)
+
+        was_unread = self._counts_as_unread(previous_status)
+        is_unread = self._counts_as_unread(notification_data["status"])
+        if was_unread and not is_unread:
+            self._queue_unread_change(pipe, user_id, -1)
+        elif is_unread and not was_unread:
+            self._queue_unread_change(pipe, user_id, 1)
+
     async def mark_as_read(self, notification_id: str) -> Optional[NotificationResponse]:
         """Mark notification as read"""
         update_data = NotificationUpdate(
@@ -199,9 +747,51 @@ class NotificationService:
         return await self.update_notification(notification_id, update_data)
 
     async def mark_as_sent(self, notification_id: str) -> Optional[NotificationResponse]:
-        """Mark notification as sent"""
-        update_data = NotificationUpdate(status=NotificationStatus.SENT)
-        return await self.update_notification(notification_id, update_data)
+        """Record a delivery and mark the notification sent.
+
+        The status only moves to SENT from PENDING or FAILED, checked inside
+        the transaction: a notification read while its email was in flight
+        keeps its READ status and stays out of the unread count, and only
+        ``sent_at`` is recorded.
+        """
+        try:
+            redis_client = await redis_manager.get_client()
+            if not redis_client:
+                return None
+
+            notification_key = f"{self.redis_prefix}{notification_id}"
+            async with redis_client.pipeline(transaction=True) as pipe:
+                while True:
+                    try:
+                        await pipe.watch(notification_key)
+                        stored = await pipe.hgetall(notification_key)
+                        notification_data = record_codec.decode(notification_id, stored)
+                        if not notification_data:
+                            return None
+
+                        previous_status = notification_data["status"]
+                        now = datetime.utcnow().isoformat()
+                        if previous_status in (NotificationStatus.PENDING.value, NotificationStatus.FAILED.value):
+                            notification_data["status"] = NotificationStatus.SENT.value
+                        notification_data["sent_at"] = now
+                        notification_data["updated_at"] = now
+                        record = self._encode_record(notification_data)
+
+                        pipe.multi()
+                        pipe.hset(notification_key, mapping=record)
+                        self._queue_drop_stale_fields(pipe, notification_key, stored, record)
+                        if notification_data["status"] != previous_status:
+                            self._queue_status_change(pipe, notification_data, previous_status)
+                        await pipe.execute()
+                        break
+                    except WatchError:
+                        continue
+
+            return self._parse_notification_data(notification_data)
+
+        except Exception as e:
+            logger.error(f"Error marking notification {notification_id} as sent: {e}")
+            return None
 
     async def mark_as_failed(self, notification_id: str) -> Optional[NotificationResponse]:
         """Mark notification as failed"""
@@ -215,20 +805,37 @@ class NotificationService:
             if not redis_client:
                 return False
 
-            # Get notification to find user ID
-            notification = await self.get_notification(notification_id)
-            if not notification:
-                return False
-
-            loop = asyncio.get_event_loop()
-            
-            # Remove from notification hash
             notification_key = f"{self.redis_prefix}{notification_id}"
-            await loop.run_in_executor(None, redis_client.delete, notification_key)
 
-            # Remove from user's notification list
-            user_key = f"{self.user_notifications_prefix}{notification.recipient_id}"
-            await loop.run_in_executor(None, redis_client.zrem, user_key, notification_id)
+            # Remove the hash, its index entries and its unread contribution
+            # atomically; WATCH guards against a concurrent status change
+            async with redis_client.pipeline(transaction=True) as pipe:
+                while True:
+                    try:
+                        await pipe.watch(notification_key)
+                        notification_data = record_codec.decode(
+                            notification_id, await pipe.hgetall(notification_key)
+                        )
+                        if not notification_data:
+                            return False
+
+                        user_id = notification_data["recipient_id"]
+                        pipe.multi()
+                        pipe.delete(notification_key)
+                        pipe.zrem(f"{self.user_notifications_prefix}{user_id}", notification_id)
+                        for status in NotificationStatus:
+                            pipe.zrem(self._status_key(user_id, status.value), notification_id)
+                        pipe.zrem(self.scheduled_key, notification_id)
+                        pipe.zrem(self.scheduled_processing_key, notification_id)
+                        pipe.zrem(self.email_outbox_key, notification_id)
+                        pipe.zrem(self.email_processing_key, notification_id)
+                        pipe.zrem(self.email_dead_letter_key, notification_id)
+                        if self._counts_as_unread(notification_data["status"]):
+                            self._queue_unread_change(pipe, user_id, -1)
+                        await pipe.execute()
+                        break
+                    except WatchError:
+                        continue
 
             logger.info(f"Deleted notification {notification_id}")
             return True
@@ -237,61 +844,338 @@ class NotificationService:
             logger.error(f"Error deleting notification {notification_id}: {e}")
             return False
 
+    async def activate_scheduled(self, redis_client, notification_ids: List[str]) -> List[Dict[str, str]]:
+        """Deliver claimed scheduled notifications: mark them pending and index them for their users.
+
+        Runs as one WATCHed MULTI/EXEC for the whole batch, which also drops
+        the IDs from the scheduler's processing set. IDs that were deleted or
+        already delivered in the meantime are just dropped. Returns the
+        activated records.
+        """
+        keys = [f"{self.redis_prefix}{notification_id}" for notification_id in notification_ids]
+        scheduled = NotificationStatus.SCHEDULED.value
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(*keys)
+                    async with redis_client.pipeline(transaction=False) as reader:
+                        for key in keys:
+                            reader.hgetall(key)
+                        stored_records = await reader.execute()
+
+                    now = datetime.utcnow().isoformat()
+                    activated = []
+                    pipe.multi()
+                    for notification_id, key, stored in zip(notification_ids, keys, stored_records):
+                        fields = record_codec.decode(notification_id, stored)
+                        if not fields or fields["status"] != scheduled:
+                            continue
+
+                        fields["status"] = NotificationStatus.PENDING.value
+                        fields["updated_at"] = now
+                        record = self._encode_record(fields)
+                        pipe.hset(key, mapping=record)
+                        self._queue_drop_stale_fields(pipe, key, stored, record)
+                        self._queue_index_entry(
+                            pipe,
+                            fields,
+                            self._index_score(
+                                datetime.fromisoformat(fields["created_at"]),
+                                datetime.fromisoformat(fields["scheduled_at"])
+                            )
+                        )
+                        self._queue_outbox(pipe, notification_id, fields["type"])
+                        activated.append(fields)
+                    pipe.zrem(self.scheduled_processing_key, *notification_ids)
+                    await pipe.execute()
+                    return activated
+                except WatchError:
+                    continue
+
     async def get_unread_count(self, user_id: str) -> int:
         """Get count of unread notifications for user"""
         try:
-            notifications_data = await self.get_user_notifications(
-                user_id, page=1, limit=1000  # Get all notifications
-            )
-            
-            unread_count = 0
-            for notification in notifications_data["notifications"]:
-                if notification.status not in [NotificationStatus.READ]:
-                    unread_count += 1
-            
-            return unread_count
+            redis_client = await redis_manager.get_client()
+            if not redis_client:
+                return 0
+
+            unread_count = await redis_client.get(self._unread_key(user_id))
+            return max(int(unread_count or 0), 0)
 
         except Exception as e:
             logger.error(f"Error getting unread count for {user_id}: {e}")
             return 0
 
-    async def cleanup_old_notifications(self, days: int = 30) -> int:
-        """Clean up notifications older than specified days"""
-        try:
-            redis_client = await redis_manager.get_client()
-            if not redis_client:
-                return 0
+    async def prune_expired_notifications(self, redis_client, user_id: str, limit: int = 500) -> Tuple[int, int]:
+        """Drop a user's index entries whose hashes have expired under their own retention.
 
-            cutoff_date = datetime.utcnow() - timedelta(days=days)
-            cutoff_timestamp = cutoff_date.timestamp()
-            loop = asyncio.get_event_loop()
+        Only entries older than the shortest retention can have expired, so
+        those are checked, ``limit`` at a time and oldest first. Keeps the
+        unread counter right for users who never list their notifications.
+        Returns (entries checked, entries pruned).
+        """
+        shortest = self._shortest_retention_seconds()
+        if shortest <= 0:
+            return 0, 0
 
-            # Get all user notification keys
-            pattern = f"{self.user_notifications_prefix}*"
-            user_keys = await loop.run_in_executor(None, lambda: list(redis_client.scan_iter(match=pattern)))
+        user_key = f"{self.user_notifications_prefix}{user_id}"
+        cutoff_timestamp = datetime.utcnow().timestamp() - shortest
+        checked = pruned = 0
+        # Pruned entries leave the index, so the next page starts after the survivors
+        offset = 0
+        while True:
+            candidates = await redis_client.zrangebyscore(user_key, 0, cutoff_timestamp, start=offset, num=limit)
+            if not candidates:
+                break
+            removed = await self._prune_expired(redis_client, user_id, candidates)
+            checked += len(candidates)
+            pruned += removed
+            offset += len(candidates) - removed
+            if len(candidates) < limit:
+                break
+        return checked, pruned
 
-            deleted_count = 0
-            for user_key in user_keys:
-                # Get old notification IDs
-                old_notification_ids = await loop.run_in_executor(
-                    None, redis_client.zrangebyscore, user_key, 0, cutoff_timestamp
-                )
-                
-                for notification_id in old_notification_ids:
-                    # Delete the notification
-                    notification_key = f"{self.redis_prefix}{notification_id}"
-                    await loop.run_in_executor(None, redis_client.delete, notification_key)
-                    deleted_count += 1
+    async def purge_user_notifications(
+        self,
+        redis_client,
+        user_id: str,
+        cutoff_timestamp: float,
+        limit: int = 500
+    ) -> int:
+        """Delete up to ``limit`` of a user's notifications created before the cutoff.
 
-                # Remove from user list
-                await loop.run_in_executor(None, redis_client.zremrangebyscore, user_key, 0, cutoff_timestamp)
+        Hashes are removed with UNLINK together with their index entries and
+        unread contribution in one transaction. Returns the number deleted;
+        fewer than ``limit`` means nothing older is left for this user.
+        """
+        user_key = f"{self.user_notifications_prefix}{user_id}"
+        read_key = self._status_key(user_id, NotificationStatus.READ.value)
 
-            logger.info(f"Cleaned up {deleted_count} old notifications")
-            return deleted_count
+        async with redis_client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(user_key, read_key)
+                    old_notification_ids = await pipe.zrangebyscore(
+                        user_key, 0, cutoff_timestamp, start=0, num=limit
+                    )
+                    if not old_notification_ids:
+                        await pipe.unwatch()
+                        return 0
 
-        except Exception as e:
-            logger.error(f"Error cleaning up old notifications: {e}")
-            return 0
+                    read_scores = await pipe.zmscore(read_key, old_notification_ids)
+                    unread_removed = sum(1 for score in read_scores if score is None)
+
+                    pipe.multi()
+                    pipe.unlink(*[f"{self.redis_prefix}{notification_id}" for notification_id in old_notification_ids])
+                    pipe.zrem(user_key, *old_notification_ids)
+                    for status in NotificationStatus:
+                        pipe.zrem(self._status_key(user_id, status.value), *old_notification_ids)
+                    if unread_removed:
+                        self._queue_unread_change(pipe, user_id, -unread_removed)
+                    await pipe.execute()
+                    return len(old_notification_ids)
+                except WatchError:
+                    continue
+
+    async def rebuild_status_indexes(self) -> int:
+        """Rebuild every per-user status index from the notification hashes.
+
+        One-shot backfill for data written before the status indexes existed;
+        safe to re-run, and online: each user is rebuilt under WATCH on their
+        index, status indexes and notification hashes in one MULTI/EXEC, so a
+        concurrent write simply retries that user. Returns the number of users
+        processed.
+        """
+        redis_client = await redis_manager.get_client()
+        if not redis_client:
+            raise Exception("Redis connection not available")
+
+        users_processed = 0
+        pattern = f"{self.user_notifications_prefix}*"
+        async for user_key in redis_client.scan_iter(match=pattern, count=500):
+            user_id = user_key[len(self.user_notifications_prefix):]
+            status_keys = [self._status_key(user_id, status.value) for status in NotificationStatus]
+
+            async with redis_client.pipeline(transaction=True) as pipe:
+                while True:
+                    try:
+                        await pipe.watch(user_key, *status_keys)
+                        entries = await pipe.zrange(user_key, 0, -1, withscores=True)
+
+                        by_status: Dict[str, Dict[str, float]] = {}
+                        for offset in range(0, len(entries), 500):
+                            chunk = entries[offset:offset + 500]
+                            notification_ids = [notification_id for notification_id, _ in chunk]
+                            await pipe.watch(*(f"{self.redis_prefix}{notification_id}" for notification_id in notification_ids))
+                            # Reads go out on a second connection; the WATCH
+                            # still guards them until EXEC
+                            records = await self._fetch_notification_records(redis_client, notification_ids)
+                            for (notification_id, score), record in zip(chunk, records):
+                                if record:
+                                    by_status.setdefault(record["status"], {})[notification_id] = score
+
+                        pipe.multi()
+                        for status_key in status_keys:
+                            pipe.delete(status_key)
+                        for status, members in by_status.items():
+                            pipe.zadd(self._status_key(user_id, status), members)
+                        await pipe.execute()
+                        break
+                    except WatchError:
+                        continue
+
+            users_processed += 1
+
+        logger.info(f"Rebuilt status indexes for {users_processed} users")
+        return users_processed
+
+    async def reconcile_unread_counts(self) -> int:
+        """Rebuild every unread counter from the sorted-set indexes.
+
+        The unread count is the size of the user index minus the size of the
+        read status index, computed and stored atomically per user. Returns the
+        number of users processed.
+        """
+        redis_client = await redis_manager.get_client()
+        if not redis_client:
+            raise Exception("Redis connection not available")
+
+        reconcile = redis_client.register_script(RECONCILE_UNREAD_SCRIPT)
+
+        users_processed = 0
+        pattern = f"{self.user_notifications_prefix}*"
+        async for user_key in redis_client.scan_iter(match=pattern, count=500):
+            user_id = user_key[len(self.user_notifications_prefix):]
+            await reconcile(keys=[
+                user_key,
+                self._status_key(user_id, NotificationStatus.READ.value),
+                self._unread_key(user_id)
+            ])
+            users_processed += 1
+
+        logger.info(f"Reconciled unread counters for {users_processed} users")
+        return users_processed
+
+    async def migrate_storage_format(self, storage_format: str, batch_size: int = 200) -> Dict[str, int]:
+        """Rewrite every notification record in the given storage format.
+
+        Runs online: each SCAN page is converted under WATCH in one MULTI/EXEC,
+        so a concurrent update simply retries the page. Records already in the
+        target format are left alone and TTLs are preserved, so the migration
+        can be interrupted and re-run at any time.
+        """
+        redis_client = await redis_manager.get_client()
+        if not redis_client:
+            raise Exception("Redis connection not available")
+
+        target_compact = storage_format == "compact"
+        scanned = converted = 0
+        cursor = 0
+        while True:
+            cursor, keys = await redis_client.scan(cursor=cursor, match=f"{self.redis_prefix}*", count=batch_size)
+            scanned += len(keys)
+
+            if keys:
+                async with redis_client.pipeline(transaction=True) as pipe:
+                    while True:
+                        try:
+                            await pipe.watch(*keys)
+                            # Reads go out as one batch on a second connection;
+                            # the WATCH still guards them until EXEC
+                            async with redis_client.pipeline(transaction=False) as reader:
+                                for key in keys:
+                                    reader.hgetall(key)
+                                records = await reader.execute()
+
+                            pending = []
+                            for key, stored in zip(keys, records):
+                                if stored and record_codec.is_compact(stored) != target_compact:
+                                    fields = record_codec.decode(key[len(self.redis_prefix):], stored)
+                                    pending.append((key, stored, record_codec.encode(fields, storage_format)))
+
+                            if not pending:
+                                await pipe.unwatch()
+                                break
+
+                            pipe.multi()
+                            for key, stored, record in pending:
+                                pipe.hset(key, mapping=record)
+                                self._queue_drop_stale_fields(pipe, key, stored, record)
+                            await pipe.execute()
+                            converted += len(pending)
+                            break
+                        except WatchError:
+                            continue
+
+            if cursor == 0:
+                break
+
+        logger.info(f"Converted {converted} of {scanned} notification records to the {storage_format} format")
+        return {"scanned": scanned, "converted": converted}
+
+    async def storage_memory_report(self, sample_size: int = 1000) -> Dict[str, Any]:
+        """Compare the Redis memory footprint of both storage formats.
+
+        A sample of existing records is written to scratch keys in each format
+        and measured with MEMORY USAGE, so both figures come from the same
+        data. Server-wide figures from INFO memory are included for tracking
+        the RSS before and after a migration.
+        """
+        redis_client = await redis_manager.get_client()
+        if not redis_client:
+            raise Exception("Redis connection not available")
+
+        sample = []
+        async for key in redis_client.scan_iter(match=f"{self.redis_prefix}*", count=500):
+            sample.append(key)
+            if len(sample) >= sample_size:
+                break
+
+        scratch_prefix = f"memory_report:{uuid.uuid4()}:"
+        totals = {"hash": 0, "compact": 0}
+        measured = 0
+        for offset in range(0, len(sample), 200):
+            chunk = sample[offset:offset + 200]
+            records = await self._fetch_notification_records(
+                redis_client, [key[len(self.redis_prefix):] for key in chunk]
+            )
+            records = [record for record in records if record]
+            if not records:
+                continue
+
+            scratch_keys = []
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for index, record in enumerate(records):
+                    for storage_format in totals:
+                        scratch_key = f"{scratch_prefix}{storage_format}:{offset + index}"
+                        pipe.hset(scratch_key, mapping=record_codec.encode(record, storage_format))
+                        scratch_keys.append((storage_format, scratch_key))
+                for _, scratch_key in scratch_keys:
+                    pipe.memory_usage(scratch_key, samples=0)
+                pipe.unlink(*[scratch_key for _, scratch_key in scratch_keys])
+                results = await pipe.execute()
+
+            usages = results[len(scratch_keys):-1]
+            for (storage_format, _), usage in zip(scratch_keys, usages):
+                totals[storage_format] += usage or 0
+            measured += len(records)
+
+        memory_info = await redis_client.info("memory")
+        average = {
+            storage_format: round(total / measured, 1) if measured else 0.0
+            for storage_format, total in totals.items()
+        }
+        return {
+            "storage_format": settings.NOTIFICATION_STORAGE_FORMAT,
+            "sampled_records": measured,
+            "avg_bytes_per_record": average,
+            "savings_percent": round(100 * (1 - totals["compact"] / totals["hash"]), 1) if totals["hash"] else 0.0,
+            "projected_savings_per_million_bytes": round((average["hash"] - average["compact"]) * 1_000_000),
+            "used_memory": memory_info.get("used_memory"),
+            "used_memory_rss": memory_info.get("used_memory_rss"),
+            "mem_fragmentation_ratio": memory_info.get("mem_fragmentation_ratio"),
+        }
 
     def _parse_notification_data(self, data: Dict[str, str]) -> NotificationResponse:
         """Parse notification data from Redis"""
@@ -309,12 +1193,41 @@ class NotificationService:
             updated_at=datetime.fromisoformat(data["updated_at"]),
             sent_at=datetime.fromisoformat(data["sent_at"]) if data.get("sent_at") else None,
             read_at=datetime.fromisoformat(data["read_at"]) if data.get("read_at") else None,
-            scheduled_at=datetime.fromisoformat(data["scheduled_at"]) if data.get("scheduled_at") else None
+            scheduled_at=datetime.fromisoformat(data["scheduled_at"]) if data.get("scheduled_at") else None,
+            attempts=int(data.get("attempts") or 0),
+            last_error=data.get("last_error") or None
         )
 
+    def _record_to_dict(self, data: Dict[str, str]) -> Dict[str, Any]:
+        """Build the API representation of a stored record without model validation.
+
+        Stored values were validated when written and timestamps are already
+        ISO strings, so this yields the same JSON as serializing the result of
+        ``_parse_notification_data`` at a fraction of the cost. Used by the
+        list endpoints.
+        """
+        return {
+            "id": data["id"],
+            "type": data["type"],
+            "recipient_id": data["recipient_id"],
+            "recipient_email": data["recipient_email"] or None,
+            "title": data["title"],
+            "message": data["message"],
+            "priority": data["priority"],
+            "status": data["status"],
+            "data": json.loads(data["data"]) if data.get("data") else None,
+            "created_at": data["created_at"],
+            "updated_at": data["updated_at"],
+            "sent_at": data.get("sent_at") or None,
+            "read_at": data.get("read_at") or None,
+            "scheduled_at": data.get("scheduled_at") or None,
+            "attempts": int(data.get("attempts") or 0),
+            "last_error": data.get("last_error") or None
+        }
+
     def get_notification_templates(self) -> Dict[str, Any]:
-        """Get all notification templates"""
-        return NOTIFICATION_TEMPLATES
+        """Get all notification templates with their current sources"""
+        return template_service.describe()
 
 
 # Global notification service instance
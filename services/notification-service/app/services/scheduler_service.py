@@ -0,0 +1,146 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from loguru import logger
+
+from app.core.config import settings
+from app.core.database import redis_manager
+from app.services.notification_service import notification_service
+
+
+# Claim due notifications for this replica. Entries whose lease ran out on the
+# processing set are reclaimed first, then due entries are moved over from the
+# schedule. KEYS: schedule, processing; ARGV: now, lease expiry, limit
+CLAIM_DUE_SCRIPT = """
+local limit = tonumber(ARGV[3])
+local claimed = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, limit)
+if #claimed < limit then
+    local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, limit - #claimed)
+    if #due > 0 then
+        redis.call('ZREM', KEYS[1], unpack(due))
+        for _, notification_id in ipairs(due) do
+            table.insert(claimed, notification_id)
+        end
+    end
+end
+for _, notification_id in ipairs(claimed) do
+    redis.call('ZADD', KEYS[2], ARGV[2], notification_id)
+end
+return claimed
+"""
+
+
+class SchedulerService:
+    """Background engine that delivers notifications created with a future ``scheduled_at``.
+
+    Scheduled notifications wait in a sorted set scored by due time. Every
+    replica runs the loop: a Lua script atomically moves a batch of due IDs
+    into a processing set with a lease, so each item is fired by exactly one
+    replica, and items of a replica that died mid-batch are reclaimed once
+    their lease expires. Full batches are fired back to back without waiting
+    for the next poll.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.fired_total = 0
+        self.last_batch_size = 0
+        self.last_batch_lag = 0.0
+        self.last_run_at: Optional[str] = None
+
+    async def start(self):
+        """Start the background scheduler loop"""
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._run_loop())
+            logger.info("Started notification scheduler")
+
+    async def stop(self):
+        """Stop the background scheduler loop; claimed items are reclaimed after their lease"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            logger.info("Stopped notification scheduler")
+
+    async def _run_loop(self):
+        while True:
+            fired = 0
+            try:
+                redis_client = await redis_manager.get_client()
+                if redis_client:
+                    fired = await self.fire_due(redis_client)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification scheduler error: {e}")
+
+            # A full batch means more are probably due: keep going
+            if fired < settings.SCHEDULER_BATCH_SIZE:
+                await asyncio.sleep(settings.SCHEDULER_POLL_INTERVAL)
+
+    async def fire_due(self, redis_client) -> int:
+        """Claim and deliver one batch of due notifications; returns how many were claimed"""
+        now = datetime.utcnow().timestamp()
+        claimed: List[str] = await redis_client.eval(
+            CLAIM_DUE_SCRIPT,
+            2,
+            notification_service.scheduled_key,
+            notification_service.scheduled_processing_key,
+            now,
+            now + settings.SCHEDULER_LEASE_SECONDS,
+            settings.SCHEDULER_BATCH_SIZE
+        )
+        if not claimed:
+            return 0
+
+        activated = await notification_service.activate_scheduled(redis_client, claimed)
+
+        fired_at = datetime.utcnow()
+        self.fired_total += len(activated)
+        self.last_batch_size = len(activated)
+        self.last_batch_lag = max(
+            ((fired_at - datetime.fromisoformat(fields["scheduled_at"])).total_seconds() for fields in activated),
+            default=0.0
+        )
+        self.last_run_at = fired_at.isoformat()
+        logger.info(f"Fired {len(activated)} scheduled notifications (lag {self.last_batch_lag:.3f}s)")
+        return len(claimed)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Scheduler backlog and lag.
+
+        ``lag_seconds`` is how overdue the oldest waiting notification is
+        (0 when nothing is due yet), measured across all replicas;
+        ``last_batch_lag_seconds`` is the worst delay in this replica's last batch.
+        """
+        stats = {
+            "scheduled": 0,
+            "processing": 0,
+            "lag_seconds": 0.0,
+            "fired_total": self.fired_total,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_lag_seconds": round(self.last_batch_lag, 3),
+            "last_run_at": self.last_run_at,
+        }
+
+        redis_client = await redis_manager.get_client()
+        if not redis_client:
+            return stats
+
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.zcard(notification_service.scheduled_key)
+            pipe.zcard(notification_service.scheduled_processing_key)
+            pipe.zrange(notification_service.scheduled_key, 0, 0, withscores=True)
+            scheduled, processing, oldest = await pipe.execute()
+
+        stats["scheduled"] = scheduled
+        stats["processing"] = processing
+        if oldest:
+            stats["lag_seconds"] = round(max(datetime.utcnow().timestamp() - oldest[0][1], 0.0), 3)
+        return stats
+
+
+# Global scheduler service instance
+scheduler_service = SchedulerService()
@@ -0,0 +1,168 @@
+import asyncio
+from typing import Dict, Optional, Set
+from loguru import logger
+
+from app.core.config import settings
+from app.core.database import redis_manager
+from app.services.notification_service import notification_service
+
+
+HEARTBEAT_FRAME = ": heartbeat\n\n"
+# Sent in place of the events a slow client missed: refetch over the REST API
+RESYNC_FRAME = "event: resync\ndata: {}\n\n"
+
+
+class StreamService:
+    """Fans out notification events to streaming (SSE) connections.
+
+    Writes publish events for a user on ``notification_stream:{user_id}`` as
+    ready-to-send SSE frames, so an event reaches the user's connections on
+    every replica. Each replica holds a single pub/sub connection subscribed
+    to the channels of the users connected to it, and hands the same frame
+    string to each of their connection queues. Queues hold at most
+    ``STREAM_QUEUE_SIZE`` frames: a client that falls further behind has its
+    backlog replaced by one ``resync`` event. One heartbeat timer serves all
+    connections.
+    """
+
+    def __init__(self):
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._running = False
+        self._subscribed = asyncio.Event()
+        self._connections: Dict[str, Set[asyncio.Queue]] = {}
+        self._unsubscribes: Set[asyncio.Task] = set()
+        self.connection_count = 0
+        self.events_received = 0
+        self.resyncs = 0
+
+    async def start(self):
+        """Start the pub/sub listener and the heartbeat timer"""
+        if self._listener and not self._listener.done():
+            return
+        redis_client = await redis_manager.get_client()
+        if not redis_client:
+            logger.warning("Redis not connected - notification streams disabled")
+            return
+        self._pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        self._running = True
+        self._listener = asyncio.create_task(self._listen())
+        self._heartbeat = asyncio.create_task(self._send_heartbeats())
+        logger.info("Started notification stream fan-out")
+
+    async def stop(self):
+        """Stop fan-out and end every open stream"""
+        # The listener may be inside a pub/sub read that does not propagate
+        # cancellation; the flag ends its loop within one poll either way
+        self._running = False
+        for task in (self._listener, self._heartbeat):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        # A None frame ends the stream, so open responses do not hold up shutdown
+        for queues in self._connections.values():
+            for queue in queues:
+                self._offer(queue, None)
+        if self._pubsub:
+            await self._pubsub.aclose()
+            self._pubsub = None
+            logger.info("Stopped notification stream fan-out")
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._listener and not self._listener.done())
+
+    async def open(self, user_id: str) -> Optional[asyncio.Queue]:
+        """Register a stream for a user; None when streaming is unavailable or full"""
+        if not self.is_running or self.connection_count >= settings.STREAM_MAX_CONNECTIONS:
+            return None
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.STREAM_QUEUE_SIZE)
+        self.connection_count += 1
+        queues = self._connections.get(user_id)
+        if queues is None:
+            queues = self._connections[user_id] = set()
+            queues.add(queue)
+            try:
+                await self._pubsub.subscribe(self._channel(user_id))
+            except Exception:
+                await self.close(user_id, queue)
+                raise
+            self._subscribed.set()
+        else:
+            queues.add(queue)
+        return queue
+
+    async def close(self, user_id: str, queue: asyncio.Queue) -> None:
+        """Unregister a stream, unsubscribing from the user's channel with their last stream"""
+        queues = self._connections.get(user_id)
+        if not queues or queue not in queues:
+            return
+        queues.discard(queue)
+        self.connection_count -= 1
+        if not queues:
+            del self._connections[user_id]
+            if self._pubsub:
+                # A client disconnect cancels the stream while it closes; the
+                # unsubscribe runs as its own task so it completes regardless
+                task = asyncio.create_task(self._unsubscribe(self._pubsub, user_id))
+                self._unsubscribes.add(task)
+                task.add_done_callback(self._unsubscribes.discard)
+                await asyncio.shield(task)
+
+    async def _unsubscribe(self, pubsub, user_id: str) -> None:
+        try:
+            await pubsub.unsubscribe(self._channel(user_id))
+        except Exception as e:
+            logger.warning(f"Failed to unsubscribe stream channel for {user_id}: {e}")
+
+    def _channel(self, user_id: str) -> str:
+        return f"{notification_service.stream_channel_prefix}{user_id}"
+
+    async def _listen(self):
+        prefix_length = len(notification_service.stream_channel_prefix)
+        while self._running:
+            try:
+                # The pub/sub connection only exists after the first subscribe
+                await self._subscribed.wait()
+                message = await self._pubsub.get_message(timeout=1.0)
+                if not message or message["type"] != "message":
+                    continue
+                self.events_received += 1
+                for queue in self._connections.get(message["channel"][prefix_length:], ()):
+                    self._offer(queue, message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Events published while reconnecting are lost: have clients refetch
+                logger.error(f"Notification stream listener error: {e}")
+                for queues in self._connections.values():
+                    for queue in queues:
+                        self._offer(queue, RESYNC_FRAME)
+                await asyncio.sleep(1)
+
+    async def _send_heartbeats(self):
+        while True:
+            await asyncio.sleep(settings.STREAM_HEARTBEAT_INTERVAL)
+            for queues in self._connections.values():
+                for queue in queues:
+                    if queue.empty():
+                        queue.put_nowait(HEARTBEAT_FRAME)
+
+    def _offer(self, queue: asyncio.Queue, frame: Optional[str]) -> None:
+        """Queue a frame, replacing the backlog of a client that fell behind with a resync"""
+        if queue.full():
+            while not queue.empty():
+                queue.get_nowait()
+            if frame is not None:
+                self.resyncs += 1
+                frame = RESYNC_FRAME
+        queue.put_nowait(frame)
+
+
+# Global stream service instance
+stream_service = StreamService()
@@ -0,0 +1,146 @@
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, Template
+from jinja2.utils import concat
+from loguru import logger
+
+from app.core.config import settings
+from app.models.notification import NOTIFICATION_TEMPLATES
+
+
+TEMPLATE_SUFFIX = ".j2"
+# Relative template directories are resolved against the service root
+SERVICE_ROOT = Path(__file__).resolve().parents[2]
+
+
+@dataclass
+class RenderedTemplate:
+    """Every variant of a template rendered for one set of variables"""
+    title: str
+    body: str
+    html: Optional[str] = None
+
+
+class TemplateService:
+    """Renders notification templates from ``EMAIL_TEMPLATE_DIR``.
+
+    A template is one Jinja2 file, ``{name}.j2``, with a ``title`` block, a
+    ``body`` block and an optional ``html`` block. Files are compiled once and
+    kept in memory; a render looks the compiled template up in a dict and
+    renders each block against a single context, so the file is neither read
+    nor parsed again. Every ``TEMPLATE_RELOAD_INTERVAL`` seconds the next
+    render of a template checks its file's mtime and recompiles it if it
+    changed. A file that fails to recompile is logged and the previous version
+    keeps serving.
+    """
+
+    def __init__(self):
+        self._environment: Optional[Environment] = None
+        self._compiled: Dict[str, Tuple[Template, float]] = {}
+
+    @property
+    def environment(self) -> Environment:
+        if self._environment is None:
+            self._environment = Environment(
+                loader=FileSystemLoader(SERVICE_ROOT / settings.EMAIL_TEMPLATE_DIR),
+                # Compiled templates are cached here, not by Jinja2, so a
+                # render never stats the file
+                cache_size=0,
+                auto_reload=False,
+                # Text variants are not HTML: html blocks escape with {% autoescape %}
+                autoescape=False,
+                undefined=StrictUndefined,
+                keep_trailing_newline=False
+            )
+        return self._environment
+
+    def preload(self) -> int:
+        """Compile every template in the directory; returns how many were loaded"""
+        loaded = 0
+        for file_name in self.environment.list_templates(extensions=[TEMPLATE_SUFFIX.lstrip(".")]):
+            try:
+                self._get(file_name[:-len(TEMPLATE_SUFFIX)])
+                loaded += 1
+            except Exception as e:
+                logger.error(f"Failed to compile template {file_name}: {e}")
+        logger.info(f"Loaded {loaded} notification templates from {settings.EMAIL_TEMPLATE_DIR}")
+        return loaded
+
+    def render(self, name: str, variables: Dict[str, Any], html: bool = True) -> RenderedTemplate:
+        """Render a template's title, body and (when ``html``) HTML variants"""
+        return self._render(self._get(name), variables, html)
+
+    def render_batch(self, requests: Iterable[Tuple[str, Dict[str, Any]]], html: bool = True) -> List[RenderedTemplate]:
+        """Render many (template name, variables) pairs, looking each template up once"""
+        templates: Dict[str, Template] = {}
+        rendered = []
+        for name, variables in requests:
+            template = templates.get(name)
+            if template is None:
+                template = templates[name] = self._get(name)
+            rendered.append(self._render(template, variables, html))
+        return rendered
+
+    def exists(self, name: str) -> bool:
+        """Whether a template is compiled or has a file"""
+        return name in self._compiled or self.get_source(name) is not None
+
+    def get_source(self, name: str) -> Optional[str]:
+        """The template file as written, or None if there is none"""
+        try:
+            return self.environment.loader.get_source(self.environment, f"{name}{TEMPLATE_SUFFIX}")[0]
+        except Exception:
+            return None
+
+    def describe(self) -> Dict[str, Any]:
+        """Template metadata with each template's current source"""
+        return {
+            name: {**metadata, "source": self.get_source(name)}
+            for name, metadata in NOTIFICATION_TEMPLATES.items()
+        }
+
+    def _render(self, template: Template, variables: Dict[str, Any], html: bool) -> RenderedTemplate:
+        # One context serves every block of the render
+        context = template.new_context(variables)
+        return RenderedTemplate(
+            title=concat(template.blocks["title"](context)).strip(),
+            body=concat(template.blocks["body"](context)).strip(),
+            html=concat(template.blocks["html"](context)).strip() if html and "html" in template.blocks else None
+        )
+
+    def _get(self, name: str) -> Template:
+        """The compiled template, recompiled first if its file changed"""
+        cached = self._compiled.get(name)
+        now = time.monotonic()
+        if cached is not None:
+            template, checked_at = cached
+            interval = settings.TEMPLATE_RELOAD_INTERVAL
+            if interval <= 0 or now - checked_at < interval:
+                return template
+            if template.is_up_to_date:
+                self._compiled[name] = (template, now)
+                return template
+            try:
+                template = self._compile(name)
+                logger.info(f"Reloaded notification template {name}")
+            except Exception as e:
+                logger.error(f"Failed to reload template {name}, keeping the previous version: {e}")
+            self._compiled[name] = (template, now)
+            return template
+
+        template = self._compile(name)
+        self._compiled[name] = (template, now)
+        return template
+
+    def _compile(self, name: str) -> Template:
+        template = self.environment.get_template(f"{name}{TEMPLATE_SUFFIX}")
+        missing = {"title", "body"} - set(template.blocks)
+        if missing:
+            raise ValueError(f"Template {name} has no {', '.join(sorted(missing))} block")
+        return template
+
+
+# Global template service instance
+template_service = TemplateService()
@@ -1,25 +1,105 @@
 from fastapi import HTTPException, Depends, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from jose import jwt, JWTError
+from collections import OrderedDict
 from datetime import datetime
+import hashlib
+import threading
+import time
 
 from app.core.config import settings
 
 security = HTTPBearer()
 
 
+class VerifiedTokenCache:
+    """Bounded LRU cache of verified JWT claims, keyed by a SHA-256 hash of the token.
+
+    Entries expire at the token's ``exp`` claim or after ``max_ttl`` seconds,
+    whichever comes first. Sync dependencies run in FastAPI's thread pool, so
+    access is guarded by a lock.
+    """
+
+    def __init__(self, max_size: int, max_ttl: float):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Return cached claims for a token, or None if absent or expired"""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return payload
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, token: str, payload: dict) -> None:
+        """Cache the claims of a token that passed verification"""
+        if self.max_size <= 0 or self.max_ttl <= 0:
+            return
+
+        expires_at = time.time() + self.max_ttl
+        if isinstance(payload.get("exp"), (int, float)):
+            expires_at = min(expires_at, payload["exp"])
+
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        """Hit and miss counters for monitoring the hit rate"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+token_cache = VerifiedTokenCache(settings.JWT_CACHE_SIZE, settings.JWT_CACHE_MAX_TTL)
+
+
+def decode_token(token: str) -> dict:
+    """Verify a JWT and return its claims, serving repeat tokens from the cache"""
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(
+            token,
+            settings.JWT_SECRET,
+            algorithms=[settings.JWT_ALGORITHM]
+        )
+        token_cache.set(token, payload)
+    return payload
+
+
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """Verify JWT token and extract user information"""
     try:
         token = credentials.credentials
         
         # Decode JWT token
-        payload = jwt.decode(
-            token,
-            settings.JWT_SECRET,
-            algorithms=[settings.JWT_ALGORITHM]
-        )
+        payload = decode_token(token)
         
         # Extract user information
         user_id = payload.get("sub") or payload.get("userId")
@@ -65,11 +145,7 @@ def optional_auth(
         
         if authorization and authorization.startswith("Bearer "):
             token = authorization.replace("Bearer ", "")
-            payload = jwt.decode(
-                token,
-                settings.JWT_SECRET,
-                algorithms=[settings.JWT_ALGORITHM]
-            )
+            payload = decode_token(token)
             
             user_id = payload.get("sub") or payload.get("userId")
             role = payload.get("role", "user")
@@ -0,0 +1,130 @@
+from fastapi import HTTPException, Request
+from typing import Callable, Dict, Optional, Tuple
+from loguru import logger
+import math
+import time
+
+from app.core.config import settings
+from app.core.database import redis_manager
+from app.core.metrics import RATE_LIMIT_DECISIONS
+from app.utils.auth import decode_token
+
+
+# Token bucket refilled continuously at ARGV[1] tokens per second up to a
+# capacity of ARGV[2]; takes ARGV[3] tokens at time ARGV[4] (epoch seconds).
+# Idle buckets expire once they would be full again. Returns
+# {allowed, seconds until allowed, tokens left}.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local last = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - last, 0) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(retry_after), math.floor(tokens)}
+"""
+
+
+class RateLimiter:
+    """Token-bucket rate limiter shared by all replicas through Redis.
+
+    Each (budget, client) pair has a bucket that refills at ``per_minute``
+    tokens a minute up to ``burst``. Checking and taking a token is a single
+    EVALSHA round trip. When Redis is unavailable requests are let through:
+    the limiter protects Redis, so it must not fail the API when Redis is the
+    one failing.
+    """
+
+    def __init__(self):
+        self.key_prefix = "rate_limit:"
+        self._script = None
+
+    def budgets(self) -> Dict[str, Tuple[int, int]]:
+        """Per-minute rate and burst of each budget"""
+        return {
+            "read": (settings.RATE_LIMIT_PER_MINUTE, settings.RATE_LIMIT_BURST),
+            "send": (settings.RATE_LIMIT_SEND_PER_MINUTE, settings.RATE_LIMIT_SEND_BURST),
+        }
+
+    async def hit(self, budget: str, identity: str, cost: int = 1) -> Tuple[bool, float]:
+        """Take ``cost`` tokens from a client's bucket; returns (allowed, seconds until allowed)"""
+        per_minute, burst = self.budgets()[budget]
+        # A cost above the burst could never be paid; it takes a full bucket instead
+        cost = min(cost, burst)
+        try:
+            redis_client = await redis_manager.get_client()
+            if not redis_client:
+                RATE_LIMIT_DECISIONS.labels(budget, "error").inc()
+                return True, 0.0
+            if self._script is None:
+                self._script = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+            allowed, retry_after, _ = await self._script(
+                keys=[f"{self.key_prefix}{budget}:{identity}"],
+                args=[per_minute / 60, burst, cost, time.time()],
+                client=redis_client
+            )
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, allowing request: {e}")
+            RATE_LIMIT_DECISIONS.labels(budget, "error").inc()
+            return True, 0.0
+
+        RATE_LIMIT_DECISIONS.labels(budget, "allowed" if allowed else "limited").inc()
+        return bool(allowed), float(retry_after)
+
+
+def client_identity(request: Request) -> str:
+    """Who a request is billed to: the JWT subject, the calling service, or the client address"""
+    service_token = request.headers.get("x-service-token")
+    if service_token and service_token == settings.SERVICE_TOKEN:
+        return "service"
+
+    authorization = request.headers.get("authorization")
+    if authorization and authorization.startswith("Bearer "):
+        try:
+            payload = decode_token(authorization[len("Bearer "):])
+            user_id: Optional[str] = payload.get("sub") or payload.get("userId")
+            if user_id:
+                return f"user:{user_id}"
+        except Exception:
+            pass
+
+    # Unauthenticated or invalid credentials: bill the connection
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+async def enforce_rate_limit(request: Request, budget: str, cost: int = 1) -> None:
+    """Charge ``cost`` tokens to the caller's budget; raises 429 with Retry-After when it is spent"""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    allowed, retry_after = await rate_limiter.hit(budget, client_identity(request), cost)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(math.ceil(retry_after), 1))}
+        )
+
+
+def rate_limit(budget: str) -> Callable:
+    """Dependency charging one token per request to a budget"""
+
+    async def dependency(request: Request) -> None:
+        await enforce_rate_limit(request, budget)
+
+    return dependency
+
+
+# Global rate limiter instance
+rate_limiter = RateLimiter()
@@ -0,0 +1,147 @@
+"""Compact storage format for notification records.
+
+The classic format stores a notification as a Redis hash with one field per
+attribute, ISO timestamps and string enums. The compact format stores the
+same record as a single hash field holding a JSON array with small enum
+codes, integer epoch microseconds and the ``data`` object inlined. The
+notification ID is not repeated inside the record; it is recovered from the
+key.
+
+Both formats decode to the classic field dict, so callers only ever work
+with one shape.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from app.models.notification import NotificationPriority, NotificationStatus, NotificationType
+
+
+COMPACT_FIELD = "c"
+COMPACT_VERSION = 1
+
+# Codes are persisted: only ever append to these tables
+TYPE_CODES = {
+    NotificationType.EMAIL.value: 0,
+    NotificationType.SYSTEM.value: 1,
+    NotificationType.PUSH.value: 2,
+    NotificationType.SMS.value: 3,
+}
+PRIORITY_CODES = {
+    NotificationPriority.LOW.value: 0,
+    NotificationPriority.MEDIUM.value: 1,
+    NotificationPriority.HIGH.value: 2,
+    NotificationPriority.URGENT.value: 3,
+}
+STATUS_CODES = {
+    NotificationStatus.PENDING.value: 0,
+    NotificationStatus.SENT.value: 1,
+    NotificationStatus.FAILED.value: 2,
+    NotificationStatus.READ.value: 3,
+    NotificationStatus.SCHEDULED.value: 4,
+}
+TYPES = {code: value for value, code in TYPE_CODES.items()}
+PRIORITIES = {code: value for value, code in PRIORITY_CODES.items()}
+STATUSES = {code: value for value, code in STATUS_CODES.items()}
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def is_compact(record: Dict[str, str]) -> bool:
+    """Whether a raw Redis hash is stored in the compact format"""
+    return COMPACT_FIELD in record
+
+
+def _to_epoch_us(value: str) -> int:
+    """Convert an ISO timestamp to integer UTC epoch microseconds (0 for empty)"""
+    if not value:
+        return 0
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return (moment - EPOCH) // MICROSECOND
+
+
+def _from_epoch_us(value: int) -> str:
+    """Convert epoch microseconds back to a naive UTC ISO timestamp ("" for 0)"""
+    if not value:
+        return ""
+    return (EPOCH + value * MICROSECOND).isoformat()
+
+
+def pack(fields: Dict[str, str]) -> Dict[str, str]:
+    """Encode classic notification fields as a single-field compact hash"""
+    record = [
+        COMPACT_VERSION,
+        TYPE_CODES[fields["type"]],
+        fields["recipient_id"],
+        fields.get("recipient_email") or "",
+        fields["title"],
+        fields["message"],
+        PRIORITY_CODES[fields["priority"]],
+        STATUS_CODES[fields["status"]],
+        json.loads(fields["data"]) if fields.get("data") else {},
+        _to_epoch_us(fields["created_at"]),
+        _to_epoch_us(fields["updated_at"]),
+        _to_epoch_us(fields.get("sent_at", "")),
+        _to_epoch_us(fields.get("read_at", "")),
+        _to_epoch_us(fields.get("scheduled_at", "")),
+    ]
+    # Delivery retry state is appended only once a delivery has failed
+    attempts = int(fields.get("attempts") or 0)
+    if attempts or fields.get("last_error"):
+        record += [attempts, fields.get("last_error") or ""]
+    return {COMPACT_FIELD: json.dumps(record, separators=(",", ":"), ensure_ascii=False)}
+
+
+def unpack(notification_id: str, record: Dict[str, str]) -> Dict[str, str]:
+    """Decode a compact hash into classic notification fields"""
+    values = json.loads(record[COMPACT_FIELD])
+    (
+        version, type_code, recipient_id, recipient_email, title, message,
+        priority_code, status_code, data, created_at, updated_at,
+        sent_at, read_at, scheduled_at
+    ) = values[:14]
+    if version != COMPACT_VERSION:
+        raise ValueError(f"Unsupported compact record version {version} for notification {notification_id}")
+
+    fields = {
+        "id": notification_id,
+        "type": TYPES[type_code],
+        "recipient_id": recipient_id,
+        "recipient_email": recipient_email,
+        "title": title,
+        "message": message,
+        "priority": PRIORITIES[priority_code],
+        "status": STATUSES[status_code],
+        "data": json.dumps(data) if data else "{}",
+        "created_at": _from_epoch_us(created_at),
+        "updated_at": _from_epoch_us(updated_at),
+        "scheduled_at": _from_epoch_us(scheduled_at),
+    }
+    # The classic format only has these fields once they are set
+    if sent_at:
+        fields["sent_at"] = _from_epoch_us(sent_at)
+    if read_at:
+        fields["read_at"] = _from_epoch_us(read_at)
+    if len(values) > 14:
+        fields["attempts"] = str(values[14])
+        fields["last_error"] = values[15]
+    return fields
+
+
+def decode(notification_id: str, record: Dict[str, str]) -> Optional[Dict[str, str]]:
+    """Decode a raw Redis hash in either format; None for a missing record"""
+    if not record:
+        return None
+    if is_compact(record):
+        return unpack(notification_id, record)
+    return record
+
+
+def encode(fields: Dict[str, str], storage_format: str) -> Dict[str, str]:
+    """Encode classic notification fields in the requested storage format"""
+    if storage_format == "compact":
+        return pack(fields)
+    return fields
@@ -0,0 +1,100 @@
+"""In-process stand-in for an AMQP queue, for benchmarks that run without a broker.
+
+Delivers published messages to a consumer the way an aio-pika channel with
+``set_qos(prefetch_count=...)`` does: one task per delivery, never more than
+``prefetch`` unsettled deliveries at a time, monotonically increasing
+delivery tags, and ``ack(multiple=True)`` settling every older tag. Messages
+only expose what the service's consumers use (``body``, ``delivery_tag``,
+``message_id``, ``redelivered``, ``ack`` and ``reject``).
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+
+class StandInMessage:
+    def __init__(
+        self,
+        channel: "StandInQueue",
+        delivery_tag: int,
+        body: bytes,
+        message_id: Optional[str] = None,
+        redelivered: bool = False
+    ):
+        self._channel = channel
+        self.delivery_tag = delivery_tag
+        self.body = body
+        self.message_id = message_id
+        self.redelivered = redelivered
+        self.published_at = time.perf_counter()
+
+    async def ack(self, multiple: bool = False) -> None:
+        self._channel._settle(self.delivery_tag, multiple, acked=True)
+
+    async def reject(self, requeue: bool = False) -> None:
+        self._channel._settle(self.delivery_tag, False, acked=False)
+
+
+class StandInQueue:
+    """A queue and its consuming channel, with a prefetch window"""
+
+    def __init__(self, prefetch: int):
+        self.prefetch = prefetch
+        self.acked = 0
+        self.rejected = 0
+        # Seconds from publish to settlement, one sample per message
+        self.latencies: List[float] = []
+        self._pending: deque = deque()
+        self._unsettled: Dict[int, StandInMessage] = {}
+        self._next_tag = 1
+        self._consumer: Optional[Callable[[StandInMessage], Awaitable[None]]] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._settled = asyncio.Event()
+
+    @property
+    def settled(self) -> int:
+        return self.acked + self.rejected
+
+    def consume(self, callback: Callable[[StandInMessage], Awaitable[None]]) -> None:
+        self._consumer = callback
+        self._dispatch()
+
+    def publish(self, body: bytes, message_id: Optional[str] = None, redelivered: bool = False) -> None:
+        self._pending.append(StandInMessage(self, self._next_tag, body, message_id, redelivered))
+        self._next_tag += 1
+        self._dispatch()
+
+    async def wait_settled(self, count: int) -> None:
+        """Wait until ``count`` messages have been acked or rejected"""
+        while self.settled < count:
+            self._settled.clear()
+            await self._settled.wait()
+
+    def _dispatch(self) -> None:
+        if self._consumer is None:
+            return
+        while self._pending and len(self._unsettled) < self.prefetch:
+            message = self._pending.popleft()
+            self._unsettled[message.delivery_tag] = message
+            task = asyncio.create_task(self._consumer(message))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _settle(self, delivery_tag: int, multiple: bool, acked: bool) -> None:
+        if multiple:
+            tags = [tag for tag in self._unsettled if tag <= delivery_tag]
+        else:
+            tags = [delivery_tag] if delivery_tag in self._unsettled else []
+
+        now = time.perf_counter()
+        for tag in tags:
+            message = self._unsettled.pop(tag)
+            self.latencies.append(now - message.published_at)
+        if acked:
+            self.acked += len(tags)
+        else:
+            self.rejected += len(tags)
+
+        self._settled.set()
+        self._dispatch()
@@ -0,0 +1,71 @@
+"""Throughput benchmark for SMTP delivery, in messages per second.
+
+Sends messages to the in-process SMTP stand-in, first with a new connection
+per message (what a naive sender does) and then through ``SMTPConnectionPool``
+at several pool sizes. ``--latency`` adds a delay to every server reply to
+approximate a remote mail server.
+
+Usage:
+    python -m benchmarks.bench_email [--messages 2000] [--latency 0.002]
+"""
+import argparse
+import asyncio
+import time
+from email.message import EmailMessage
+
+import aiosmtplib
+
+from app.services.email_service import SMTPConnectionPool
+from benchmarks.smtp_standin import SMTPStandIn
+
+
+def make_message(index: int) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = "noreply@library.com"
+    message["To"] = f"reader{index}@example.com"
+    message["Subject"] = "Book Reserved Successfully"
+    message.set_content("You have successfully reserved 'The Great Gatsby'. Due date: 2024-01-29")
+    return message
+
+
+async def bench_connection_per_message(server: SMTPStandIn, count: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(index: int):
+        async with semaphore:
+            await aiosmtplib.send(make_message(index), hostname=server.host, port=server.port)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(index) for index in range(count)))
+    return count / (time.perf_counter() - started)
+
+
+async def bench_pool(server: SMTPStandIn, count: int, size: int) -> float:
+    pool = SMTPConnectionPool(server.host, server.port, size=size, messages_per_connection=100)
+    started = time.perf_counter()
+    await asyncio.gather(*(pool.send(make_message(index)) for index in range(count)))
+    elapsed = time.perf_counter() - started
+    await pool.close()
+    return count / elapsed
+
+
+async def main(count: int, latency: float) -> None:
+    server = await SMTPStandIn(latency=latency).start()
+    try:
+        print(f"{'mode':<32}  {'msg/s':>8}")
+        for concurrency in (1, 5):
+            rate = await bench_connection_per_message(server, count, concurrency)
+            print(f"{f'connection per message (x{concurrency})':<32}  {rate:>8.0f}")
+        for size in (1, 5, 10):
+            rate = await bench_pool(server, count, size)
+            print(f"{f'pooled ({size} connections)':<32}  {rate:>8.0f}")
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every server reply")
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.latency))
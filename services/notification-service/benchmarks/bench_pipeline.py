@@ -0,0 +1,478 @@
+"""End-to-end benchmarks for the notification pipeline, with results written as JSON.
+
+Runs against a real Redis given by ``--redis-url``:
+
+- ``ingest``: events from publish until their notifications are persisted and
+  the deliveries acked, through the service's consumers and batchers. Events
+  go through the in-process AMQP stand-in by default, or through the RabbitMQ
+  broker from the settings with ``--broker``. ``--redeliver`` delivers that
+  share of events a second time, flagged as redelivered, to measure the cost
+  of skipping duplicates.
+- ``api``: p50/p99 latency and throughput of ``GET /user/{user_id}``,
+  ``GET /user/{user_id}/unread-count`` and ``POST /send`` at each
+  ``--concurrency`` level, in-process over ASGI or against a running service
+  with ``--base-url`` (start it with ``RATE_LIMIT_ENABLED=false``).
+- ``cleanup``: a cleanup job over a seeded dataset (``--notifications``, one
+  million by default), ``--expired-ratio`` of it past the cutoff, unthrottled
+  unless ``--cleanup-ops`` is set.
+
+Every scenario starts from an empty database, so the benchmark flushes the
+database it is given and refuses to start on one that holds data unless
+``--flush`` is passed. Point it at a database of its own.
+
+Usage:
+    python -m benchmarks.bench_pipeline --redis-url redis://localhost:6379/15
+        [--scenario ingest api cleanup] [--events 20000] [--event-rate 0] [--redeliver 0] [--broker]
+        [--requests 2000] [--concurrency 1 10 50] [--base-url http://localhost:8000]
+        [--notifications 1000000] [--cleanup-ops 0] [--output results.json] [--flush]
+"""
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import httpx
+from jose import jwt
+from loguru import logger
+
+from app.core.config import settings
+from app.core.database import redis_manager
+from app.models.notification import NotificationCreate, NotificationType
+from app.services.cleanup_service import cleanup_service
+from app.services.event_service import QUEUE_BINDINGS, event_service
+from app.services.notification_service import notification_service
+from benchmarks.amqp_standin import StandInQueue
+
+
+SCENARIOS = ("ingest", "api", "cleanup")
+
+# Events published by the ingest scenario, in rotation: (event type, payload)
+EVENT_MIX = [
+    ("user.registered", {"firstName": "Reader", "email": "reader@example.com"}),
+    ("reservation.created", {"bookTitle": "The Great Gatsby", "bookAuthor": "F. Scott Fitzgerald", "dueDate": "2024-01-29"}),
+    ("reservation.returned", {"bookTitle": "The Great Gatsby"}),
+]
+
+QUEUE_BY_EVENT_TYPE = {
+    event_type: queue_name
+    for queue_name, event_types in QUEUE_BINDINGS.items()
+    for event_type in event_types
+}
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Latency percentiles in milliseconds (nearest rank)"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def percentile(fraction: float) -> float:
+        return round(ordered[min(int(fraction * len(ordered)), len(ordered) - 1)] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": percentile(0.50),
+        "p90_ms": percentile(0.90),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def make_event(index: int, users: int) -> Dict[str, Any]:
+    event_type, payload = EVENT_MIX[index % len(EVENT_MIX)]
+    return {"eventType": event_type, "data": {**payload, "userId": f"bench-user-{index % users}"}}
+
+
+async def flush_database() -> None:
+    redis_client = await redis_manager.get_client()
+    await redis_client.flushdb()
+
+
+async def count_unread(users: int) -> int:
+    """Unread notifications across the benchmark users: one per persisted event"""
+    redis_client = await redis_manager.get_client()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for user in range(users):
+            pipe.get(notification_service._unread_key(f"bench-user-{user}"))
+        counts = await pipe.execute()
+    return sum(int(count or 0) for count in counts)
+
+
+async def bench_ingest(events: int, users: int, event_rate: float, redeliver: float, use_broker: bool) -> Dict[str, Any]:
+    """Publish events and wait until every delivery is settled"""
+    if use_broker:
+        result = await ingest_through_broker(events, users)
+    else:
+        result = await ingest_through_standin(events, users, event_rate, redeliver)
+
+    result["persisted"] = await count_unread(users)
+    result["duplicates_skipped"] = sum(stats.duplicates for stats in event_service.stats.values())
+    result["events_per_second"] = round(events / result["elapsed_seconds"], 1)
+    return result
+
+
+async def publish_paced(events: int, event_rate: float, publish) -> None:
+    """Call ``publish(index)`` for every event, at ``event_rate`` per second when set"""
+    if not event_rate:
+        for index in range(events):
+            await publish(index)
+        return
+
+    started = time.perf_counter()
+    published = 0
+    while published < events:
+        due = min(int((time.perf_counter() - started) * event_rate) + 1, events)
+        while published < due:
+            await publish(published)
+            published += 1
+        await asyncio.sleep(0.001)
+
+
+async def ingest_through_standin(events: int, users: int, event_rate: float, redeliver: float) -> Dict[str, Any]:
+    queues = {}
+    for queue_name in QUEUE_BINDINGS:
+        queues[queue_name] = StandInQueue(prefetch=event_service.stats[queue_name].prefetch)
+        queues[queue_name].consume(event_service._make_consumer(queue_name))
+
+    redeliver_every = round(redeliver * 100)
+    expected = {queue_name: 0 for queue_name in QUEUE_BINDINGS}
+    for index in range(events):
+        copies = 2 if index % 100 < redeliver_every else 1
+        expected[QUEUE_BY_EVENT_TYPE[EVENT_MIX[index % len(EVENT_MIX)][0]]] += copies
+
+    async def publish(index: int) -> None:
+        event = make_event(index, users)
+        queue = queues[QUEUE_BY_EVENT_TYPE[event["eventType"]]]
+        body = json.dumps(event).encode()
+        queue.publish(body, message_id=f"bench-{index}")
+        if index % 100 < redeliver_every:
+            queue.publish(body, message_id=f"bench-{index}", redelivered=True)
+
+    started = time.perf_counter()
+    await publish_paced(events, event_rate, publish)
+    await asyncio.gather(*(queue.wait_settled(expected[name]) for name, queue in queues.items()))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "transport": "standin",
+        "events": events,
+        "elapsed_seconds": round(elapsed, 3),
+        "acked": sum(queue.acked for queue in queues.values()),
+        "rejected": sum(queue.rejected for queue in queues.values()),
+        "publish_to_ack": summarize([sample for queue in queues.values() for sample in queue.latencies]),
+    }
+
+
+async def ingest_through_broker(events: int, users: int) -> Dict[str, Any]:
+    import aio_pika
+
+    await event_service.connect()
+    if not event_service.is_connected:
+        raise SystemExit("RabbitMQ is not reachable with the configured RABBITMQ_* settings")
+    await event_service.start_consuming()
+
+    def settled() -> int:
+        return sum(stats.completed + stats.failed for stats in event_service.stats.values())
+
+    try:
+        channel = await event_service.connection.channel()
+        exchange = await channel.declare_exchange(settings.RABBITMQ_EXCHANGE, aio_pika.ExchangeType.TOPIC, durable=True)
+        baseline = settled()
+
+        async def publish(index: int) -> None:
+            event = make_event(index, users)
+            await exchange.publish(
+                aio_pika.Message(
+                    json.dumps(event).encode(),
+                    message_id=f"bench-{index}",
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT
+                ),
+                routing_key=event["eventType"].replace('.', '_')
+            )
+
+        started = time.perf_counter()
+        # Publisher confirms make each publish a round trip: keep a window in flight
+        for offset in range(0, events, 500):
+            await asyncio.gather(*(publish(index) for index in range(offset, min(offset + 500, events))))
+        while settled() - baseline < events:
+            await asyncio.sleep(0.005)
+        elapsed = time.perf_counter() - started
+
+        return {
+            "transport": "broker",
+            "events": events,
+            "elapsed_seconds": round(elapsed, 3),
+            "acked": sum(stats.completed for stats in event_service.stats.values()),
+            "rejected": sum(stats.failed for stats in event_service.stats.values()),
+        }
+    finally:
+        await event_service.disconnect()
+
+
+async def seed_notifications(count: int, users: int, age_for_index) -> float:
+    """Write ``count`` notifications through the create path; returns notifications per second"""
+    redis_client = await redis_manager.get_client()
+    templates = [
+        NotificationCreate(
+            type=NotificationType.SYSTEM,
+            recipient_id=f"bench-user-{user}",
+            title="Book Reserved Successfully",
+            message="You have successfully reserved 'The Great Gatsby' by F. Scott Fitzgerald. Due date: 2024-01-29",
+            data={"book_id": "book-456"}
+        )
+        for user in range(users)
+    ]
+    now = datetime.utcnow()
+    semaphore = asyncio.Semaphore(4)
+
+    async def write(offset: int, size: int) -> None:
+        async with semaphore:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for index in range(offset, offset + size):
+                    notification = notification_service._new_notification(
+                        templates[index % users], now - age_for_index(index)
+                    )
+                    notification_service._queue_create(pipe, notification)
+                await pipe.execute()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(write(offset, min(1000, count - offset)) for offset in range(0, count, 1000)))
+    return count / (time.perf_counter() - started)
+
+
+def make_token(user_id: str) -> str:
+    claims = {"sub": user_id, "role": "user", "exp": datetime.utcnow() + timedelta(hours=1)}
+    return jwt.encode(claims, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+
+
+async def run_requests(client: httpx.AsyncClient, total: int, concurrency: int, build) -> Dict[str, Any]:
+    """Issue ``total`` requests from ``concurrency`` workers; ``build(index)`` returns request kwargs"""
+    latencies: List[float] = []
+    errors = 0
+    issued = 0
+
+    async def worker():
+        nonlocal errors, issued
+        while issued < total:
+            index = issued
+            issued += 1
+            started = time.perf_counter()
+            try:
+                response = await client.request(**build(index))
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": total,
+        "errors": errors,
+        "requests_per_second": round(total / elapsed, 1),
+        "latency": summarize(latencies),
+    }
+
+
+async def bench_api(
+    requests: int,
+    concurrency_levels: List[int],
+    users: int,
+    per_user: int,
+    base_url: str
+) -> Dict[str, Any]:
+    """Latency of the read and send routes at each concurrency level"""
+    await seed_notifications(users * per_user, users, lambda index: timedelta(seconds=index))
+
+    tokens = [{"Authorization": f"Bearer {make_token(f'bench-user-{user}')}"} for user in range(users)]
+    prefix = f"/api/{settings.API_VERSION}/notifications"
+    routes = {
+        "GET /user/{user_id}": lambda index: {
+            "method": "GET", "url": f"{prefix}/user/bench-user-{index % users}", "headers": tokens[index % users]
+        },
+        "GET /user/{user_id}/unread-count": lambda index: {
+            "method": "GET", "url": f"{prefix}/user/bench-user-{index % users}/unread-count", "headers": tokens[index % users]
+        },
+        "POST /send": lambda index: {
+            "method": "POST",
+            "url": f"{prefix}/send",
+            "headers": {"X-Service-Token": settings.SERVICE_TOKEN},
+            "json": {
+                "type": "system",
+                "recipient": f"bench-user-{index % users}",
+                "title": "Book Returned",
+                "message": "Thank you for returning 'The Great Gatsby'."
+            },
+        },
+    }
+
+    if base_url:
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(max_connections=max(concurrency_levels)),
+            timeout=30.0
+        )
+    else:
+        from app.main import app
+
+        # Measures the service, not the limiter's verdicts on a single client
+        settings.RATE_LIMIT_ENABLED = False
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    results: Dict[str, Any] = {"target": base_url or "in-process", "users": users, "per_user": per_user, "routes": {}}
+    async with client:
+        for route, build in routes.items():
+            # Warm connections, caches and the token cache before measuring
+            await run_requests(client, min(requests, 100), max(concurrency_levels), build)
+            results["routes"][route] = {
+                str(concurrency): await run_requests(client, requests, concurrency, build)
+                for concurrency in concurrency_levels
+            }
+    return results
+
+
+async def bench_cleanup(notifications: int, users: int, expired_ratio: float, days: int, max_ops: int) -> Dict[str, Any]:
+    """Seed notifications spread around the cutoff and time a cleanup job over them"""
+    expired_every = round(expired_ratio * 100)
+
+    def age(index: int) -> timedelta:
+        # Spread over the window before (expired) or after (kept) the cutoff
+        spread = timedelta(days=days - 1) * ((index * 7919) % 1000) / 1000
+        return timedelta(days=days + 1) + spread if index % 100 < expired_every else spread
+
+    seed_rate = await seed_notifications(notifications, users, age)
+    expected = sum(1 for index in range(notifications) if index % 100 < expired_every)
+
+    redis_client = await redis_manager.get_client()
+    memory_before = (await redis_client.info("memory"))["used_memory"]
+
+    settings.CLEANUP_MAX_OPS_PER_SECOND = max_ops or 10 ** 9
+    job = await cleanup_service.create_job(days, trigger="benchmark")
+    await redis_client.set(cleanup_service.lease_key, cleanup_service.worker_id, ex=settings.CLEANUP_LEASE_SECONDS)
+    started = time.perf_counter()
+    await cleanup_service._run_pending_jobs(redis_client)
+    elapsed = time.perf_counter() - started
+    await redis_client.delete(cleanup_service.lease_key)
+
+    job = await cleanup_service.get_job(job["job_id"])
+    return {
+        "notifications": notifications,
+        "users": users,
+        "seed_per_second": round(seed_rate, 1),
+        "expected_deleted": expected,
+        "deleted": job["deleted_count"],
+        "users_scanned": job["users_scanned"],
+        "status": job["status"],
+        "elapsed_seconds": round(elapsed, 3),
+        "deleted_per_second": round(job["deleted_count"] / elapsed, 1),
+        "max_ops_per_second": max_ops or None,
+        "used_memory_before": memory_before,
+        "used_memory_after": (await redis_client.info("memory"))["used_memory"],
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def main(args: argparse.Namespace) -> Dict[str, Any]:
+    settings.REDIS_URL = args.redis_url
+    await redis_manager.connect()
+    redis_client = await redis_manager.get_client()
+    if not redis_client:
+        raise SystemExit(f"Redis is not reachable at {args.redis_url}")
+    if await redis_client.dbsize() and not args.flush:
+        raise SystemExit(f"{args.redis_url} is not empty; pass --flush to let the benchmark clear it")
+
+    report: Dict[str, Any] = {
+        "benchmark": "notification_pipeline",
+        "started_at": datetime.utcnow().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "redis_version": (await redis_client.info("server"))["redis_version"],
+            "git_commit": git_commit(),
+        },
+        "settings": {
+            name: getattr(settings, name)
+            for name in (
+                "NOTIFICATION_STORAGE_FORMAT", "REDIS_MAX_CONNECTIONS", "BATCH_SIZE", "EVENT_BATCH_LINGER_MS",
+                "EVENT_PREFETCH_COUNT", "EVENT_CONCURRENCY", "CLEANUP_SCAN_COUNT", "CLEANUP_BATCH_SIZE",
+            )
+        },
+        "args": {name: value for name, value in vars(args).items() if name != "output"},
+        "results": {},
+    }
+
+    try:
+        for scenario in args.scenario:
+            await flush_database()
+            print(f"Running {scenario}...", file=sys.stderr)
+            if scenario == "ingest":
+                result = await bench_ingest(args.events, args.users, args.event_rate, args.redeliver, args.broker)
+            elif scenario == "api":
+                result = await bench_api(args.requests, args.concurrency, args.users, args.per_user, args.base_url)
+            else:
+                result = await bench_cleanup(
+                    args.notifications, args.cleanup_users, args.expired_ratio, args.days, args.cleanup_ops
+                )
+            report["results"][scenario] = result
+        await flush_database()
+    finally:
+        await redis_manager.disconnect()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", required=True, help="Database the benchmark may flush")
+    parser.add_argument("--flush", action="store_true", help="Allow clearing a database that holds data")
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--log-level", default="WARNING", help="Service log level while benchmarking")
+    parser.add_argument("--users", type=int, default=1000, help="Recipients for ingest and api")
+
+    ingest = parser.add_argument_group("ingest")
+    ingest.add_argument("--events", type=int, default=20000)
+    ingest.add_argument("--event-rate", type=float, default=0.0, help="Events published per second; 0 publishes all at once")
+    ingest.add_argument("--redeliver", type=float, default=0.0, help="Share of events delivered twice (stand-in only)")
+    ingest.add_argument("--broker", action="store_true", help="Publish through RabbitMQ instead of the stand-in")
+
+    api = parser.add_argument_group("api")
+    api.add_argument("--requests", type=int, default=2000, help="Requests per route and concurrency level")
+    api.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    api.add_argument("--per-user", type=int, default=50, help="Notifications seeded per user")
+    api.add_argument("--base-url", help="Benchmark a running service instead of the app in-process")
+
+    cleanup = parser.add_argument_group("cleanup")
+    cleanup.add_argument("--notifications", type=int, default=1_000_000)
+    cleanup.add_argument("--cleanup-users", type=int, default=10000)
+    cleanup.add_argument("--expired-ratio", type=float, default=0.5, help="Share of notifications past the cutoff")
+    cleanup.add_argument("--days", type=int, default=30, help="Cleanup cutoff in days")
+    cleanup.add_argument("--cleanup-ops", type=int, default=0, help="CLEANUP_MAX_OPS_PER_SECOND; 0 runs unthrottled")
+
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    report = asyncio.run(main(args))
+    rendered = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(rendered + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(rendered)
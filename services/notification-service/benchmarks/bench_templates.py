@@ -0,0 +1,62 @@
+"""Micro-benchmark for rendering notification templates, in renders per second.
+
+Compares compiling the template on every render, and loading it through a
+caching Jinja2 environment (which stats the file on every load to check for
+changes), against the template service's compiled cache, rendering one at a
+time and as a batch.
+
+Usage:
+    python -m benchmarks.bench_templates [--renders 20000]
+"""
+import argparse
+import time
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+from app.core.config import settings
+from app.services.template_service import SERVICE_ROOT, template_service
+
+
+VARIABLES = {"book_title": "The Great Gatsby", "book_author": "F. Scott Fitzgerald", "due_date": "2024-01-29"}
+
+
+def bench_environment(count: int, cache_size: int) -> float:
+    environment = Environment(
+        loader=FileSystemLoader(SERVICE_ROOT / settings.EMAIL_TEMPLATE_DIR),
+        cache_size=cache_size,
+        auto_reload=True,
+        undefined=StrictUndefined
+    )
+    started = time.perf_counter()
+    for _ in range(count):
+        template = environment.get_template("reservation_created.j2")
+        context = template.new_context(VARIABLES)
+        for block in ("title", "body", "html"):
+            "".join(template.blocks[block](context))
+    return count / (time.perf_counter() - started)
+
+
+def bench_service(count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        template_service.render("reservation_created", VARIABLES)
+    return count / (time.perf_counter() - started)
+
+
+def bench_service_batch(count: int) -> float:
+    started = time.perf_counter()
+    template_service.render_batch(("reservation_created", VARIABLES) for _ in range(count))
+    return count / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--renders", type=int, default=20000)
+    args = parser.parse_args()
+
+    template_service.preload()
+    print(f"{'mode':<32}  {'renders/s':>10}")
+    print(f"{'compile every render':<32}  {bench_environment(args.renders // 10, 0):>10.0f}")
+    print(f"{'jinja2 cache, auto reload':<32}  {bench_environment(args.renders, 400):>10.0f}")
+    print(f"{'template service':<32}  {bench_service(args.renders):>10.0f}")
+    print(f"{'template service, batch':<32}  {bench_service_batch(args.renders):>10.0f}")
@@ -0,0 +1,87 @@
+"""Minimal in-process SMTP server for local testing and benchmarks.
+
+Accepts every message and only counts what it receives. Run it standalone
+and point the service at it to exercise email delivery without a real mail
+server:
+
+    python -m benchmarks.smtp_standin --port 1025
+    SMTP_HOST=localhost SMTP_PORT=1025 EMAIL_DELIVERY_ENABLED=true uvicorn app.main:app
+"""
+import argparse
+import asyncio
+
+
+class SMTPStandIn:
+    """Just enough SMTP for aiosmtplib: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.messages = 0
+        self.connections = 0
+        self._server = None
+
+    async def start(self) -> "SMTPStandIn":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _reply(self, writer, line: bytes) -> None:
+        # Simulated network round trip per command
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        writer.write(line)
+        await writer.drain()
+
+    async def _handle(self, reader, writer) -> None:
+        self.connections += 1
+        await self._reply(writer, b"220 standin ESMTP\r\n")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line[:4].upper()
+                if command == b"EHLO":
+                    await self._reply(writer, b"250-standin\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n")
+                elif command == b"DATA":
+                    await self._reply(writer, b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                    while (await reader.readline()) not in (b".\r\n", b""):
+                        pass
+                    self.messages += 1
+                    await self._reply(writer, b"250 OK queued\r\n")
+                elif command == b"QUIT":
+                    await self._reply(writer, b"221 Bye\r\n")
+                    break
+                elif command in (b"HELO", b"MAIL", b"RCPT", b"RSET", b"NOOP"):
+                    await self._reply(writer, b"250 OK\r\n")
+                else:
+                    await self._reply(writer, b"502 Command not implemented\r\n")
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host: str, port: int) -> None:
+    server = await SMTPStandIn(host, port).start()
+    print(f"SMTP stand-in listening on {host}:{server.port}")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(f"{server.messages} messages over {server.connections} connections")
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Minimal SMTP server that accepts and counts messages")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))